@@ -3,10 +3,9 @@ Configuration file for Multi-Platform Social Media Posting API
 """
 
 import os
-from dotenv import load_dotenv
 
 # Load environment variables
-load_dotenv()
+from platforms import _env  # noqa: F401
 
 class Config:
     """Base configuration"""
@@ -16,6 +15,11 @@ class Config:
     API_PORT = int(os.getenv('API_PORT', 8000))
     API_DEBUG = os.getenv('API_DEBUG', 'True').lower() == 'true'
     
+    # CORS (comma-separated origins)
+    CORS_ORIGINS = [o.strip() for o in os.getenv('CORS_ORIGINS', '*').split(',') if o.strip()]
+    CORS_METHODS = ['GET', 'POST']
+    CORS_HEADERS = ['Authorization', 'Content-Type']
+    
     # Facebook
     FACEBOOK_ACCESS_TOKEN = os.getenv('FACEBOOK_ACCESS_TOKEN')
     FACEBOOK_PAGE_ID = os.getenv('FACEBOOK_PAGE_ID')
@@ -48,24 +52,26 @@ class Config:
     YOUTUBE_CLIENT_ID = os.getenv('YOUTUBE_CLIENT_ID')
     YOUTUBE_CLIENT_SECRET = os.getenv('YOUTUBE_CLIENT_SECRET')
     
+    # Credential status per platform, resolved once since env vars don't change at runtime
+    _CREDS_VALID = {
+        'facebook': FACEBOOK_ACCESS_TOKEN is not None,
+        'instagram': INSTAGRAM_ACCESS_TOKEN is not None and INSTAGRAM_ACCOUNT_ID is not None,
+        'tiktok': TIKTOK_ACCESS_TOKEN is not None,
+        'x': X_BEARER_TOKEN is not None or (X_ACCESS_TOKEN is not None and X_ACCESS_TOKEN_SECRET is not None),
+        'threads': THREADS_ACCESS_TOKEN is not None and THREADS_USER_ID is not None,
+        'youtube': YOUTUBE_ACCESS_TOKEN is not None
+    }
+    AVAILABLE_PLATFORMS = tuple(p for p, valid in _CREDS_VALID.items() if valid)
+    
     @classmethod
     def validate_credentials(cls, platform: str) -> bool:
         """Validate if credentials are available for a platform"""
-        validation_map = {
-            'facebook': cls.FACEBOOK_ACCESS_TOKEN is not None,
-            'instagram': cls.INSTAGRAM_ACCESS_TOKEN is not None and cls.INSTAGRAM_ACCOUNT_ID is not None,
-            'tiktok': cls.TIKTOK_ACCESS_TOKEN is not None,
-            'x': cls.X_BEARER_TOKEN is not None or (cls.X_ACCESS_TOKEN is not None and cls.X_ACCESS_TOKEN_SECRET is not None),
-            'threads': cls.THREADS_ACCESS_TOKEN is not None and cls.THREADS_USER_ID is not None,
-            'youtube': cls.YOUTUBE_ACCESS_TOKEN is not None
-        }
-        return validation_map.get(platform, False)
+        return cls._CREDS_VALID.get(platform, False)
     
     @classmethod
     def get_available_platforms(cls) -> list:
         """Get list of platforms with valid credentials"""
-        platforms = ['facebook', 'instagram', 'tiktok', 'x', 'threads', 'youtube']
-        return [p for p in platforms if cls.validate_credentials(p)]
+        return list(cls.AVAILABLE_PLATFORMS)
 
 # Create config instance
 config = Config()
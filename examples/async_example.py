@@ -9,6 +9,9 @@ from typing import List, Dict
 
 BASE_URL = "http://localhost:8000"
 
+# Max requests in flight at once for rate-limited examples
+MAX_CONCURRENCY = 5
+
 async def post_to_platform(session: aiohttp.ClientSession, platform: str, text: str, media_url: str = None) -> Dict:
     """Post to a single platform asynchronously"""
     url = f"{BASE_URL}/api/post/{platform}"
@@ -31,7 +34,7 @@ async def post_to_platform(session: aiohttp.ClientSession, platform: str, text:
             "error": str(e)
         }
 
-async def batch_post_multiple_platforms():
+async def batch_post_multiple_platforms(session: aiohttp.ClientSession):
     """Post to multiple platforms concurrently"""
     print("🚀 Posting to multiple platforms concurrently...")
     
@@ -39,25 +42,24 @@ async def batch_post_multiple_platforms():
     text = "Hello from async Python! 🐍⚡"
     media_url = "https://picsum.photos/800/600"
     
-    async with aiohttp.ClientSession() as session:
-        # Create tasks for all platforms
-        tasks = [
-            post_to_platform(session, platform, text, media_url)
-            for platform in platforms
-        ]
-        
-        # Execute all tasks concurrently
-        results = await asyncio.gather(*tasks)
-        
-        # Print results
-        print("\n✅ Results:")
-        for result in results:
-            if result["success"]:
-                print(f"  ✓ {result['platform']}: Success (ID: {result.get('post_id')})")
-            else:
-                print(f"  ✗ {result['platform']}: Failed - {result.get('error')}")
+    # Create tasks for all platforms
+    tasks = [
+        post_to_platform(session, platform, text, media_url)
+        for platform in platforms
+    ]
+    
+    # Execute all tasks concurrently
+    results = await asyncio.gather(*tasks)
+    
+    # Print results
+    print("\n✅ Results:")
+    for result in results:
+        if result["success"]:
+            print(f"  ✓ {result['platform']}: Success (ID: {result.get('post_id')})")
+        else:
+            print(f"  ✗ {result['platform']}: Failed - {result.get('error')}")
 
-async def sequential_posts_with_different_content():
+async def sequential_posts_with_different_content(session: aiohttp.ClientSession):
     """Post different content to different platforms"""
     print("\n📝 Posting different content to each platform...")
     
@@ -84,23 +86,22 @@ async def sequential_posts_with_different_content():
         }
     ]
     
-    async with aiohttp.ClientSession() as session:
-        tasks = [
-            post_to_platform(session, post["platform"], post["text"], post["media"])
-            for post in posts
-        ]
-        
-        results = await asyncio.gather(*tasks)
-        
-        print("\n✅ Results:")
-        for i, result in enumerate(results):
-            platform = posts[i]["platform"]
-            if result["success"]:
-                print(f"  ✓ {platform}: Posted successfully")
-            else:
-                print(f"  ✗ {platform}: {result.get('error')}")
+    tasks = [
+        post_to_platform(session, post["platform"], post["text"], post["media"])
+        for post in posts
+    ]
+    
+    results = await asyncio.gather(*tasks)
+    
+    print("\n✅ Results:")
+    for i, result in enumerate(results):
+        platform = posts[i]["platform"]
+        if result["success"]:
+            print(f"  ✓ {platform}: Posted successfully")
+        else:
+            print(f"  ✗ {platform}: {result.get('error')}")
 
-async def bulk_upload_and_post():
+async def bulk_upload_and_post(session: aiohttp.ClientSession):
     """Upload multiple files and post them"""
     print("\n📤 Bulk upload and post example...")
     
@@ -123,51 +124,51 @@ async def bulk_upload_and_post():
         }
     ]
     
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        
-        for post_data in post_data_list:
-            url = f"{BASE_URL}/api/post"
-            task = session.post(url, json=post_data)
-            tasks.append(task)
-        
-        responses = await asyncio.gather(*tasks)
-        
-        print("\n✅ Bulk post results:")
-        for i, response in enumerate(responses):
-            results = await response.json()
-            print(f"\n  Post #{i+1}:")
-            for result in results:
-                status = "✓" if result["success"] else "✗"
-                print(f"    {status} {result['platform']}")
+    tasks = []
+    
+    for post_data in post_data_list:
+        url = f"{BASE_URL}/api/post"
+        task = session.post(url, json=post_data)
+        tasks.append(task)
+    
+    responses = await asyncio.gather(*tasks)
+    
+    print("\n✅ Bulk post results:")
+    for i, response in enumerate(responses):
+        results = await response.json()
+        print(f"\n  Post #{i+1}:")
+        for result in results:
+            status = "✓" if result["success"] else "✗"
+            print(f"    {status} {result['platform']}")
 
-async def monitor_post_status():
+async def monitor_post_status(session: aiohttp.ClientSession):
     """Monitor API health continuously"""
     print("\n🔍 Monitoring API status...")
     
-    async with aiohttp.ClientSession() as session:
-        for i in range(5):
-            try:
-                async with session.get(f"{BASE_URL}/health") as response:
-                    health = await response.json()
-                    print(f"  Check {i+1}: Status = {health['status']}, Platforms = {len(health['platforms_available'])}")
-                
-                await asyncio.sleep(2)  # Wait 2 seconds between checks
+    for i in range(5):
+        try:
+            async with session.get(f"{BASE_URL}/health") as response:
+                health = await response.json()
+                print(f"  Check {i+1}: Status = {health['status']}, Platforms = {len(health['platforms_available'])}")
             
-            except Exception as e:
-                print(f"  Check {i+1}: Error - {e}")
-                await asyncio.sleep(2)
+            await asyncio.sleep(2)  # Wait 2 seconds between checks
+        
+        except Exception as e:
+            print(f"  Check {i+1}: Error - {e}")
+            await asyncio.sleep(2)
 
-async def rate_limited_posting():
+async def rate_limited_posting(session: aiohttp.ClientSession):
     """Post with rate limiting to avoid API limits"""
     print("\n⏱️ Rate-limited posting example...")
     
     posts = [f"Post #{i}: Testing rate limiting" for i in range(1, 11)]
+    url = f"{BASE_URL}/api/post/facebook"
     
-    async with aiohttp.ClientSession() as session:
-        for i, text in enumerate(posts, 1):
-            url = f"{BASE_URL}/api/post/facebook"
-            
+    # Allow up to MAX_CONCURRENCY posts in flight instead of one per second
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    
+    async def post_one(i: int, text: str):
+        async with semaphore:
             try:
                 async with session.post(url, data={"text": text}) as response:
                     result = await response.json()
@@ -176,40 +177,38 @@ async def rate_limited_posting():
                         print(f"  ✓ Posted #{i}")
                     else:
                         print(f"  ✗ Failed #{i}: {result.get('error')}")
-                
-                # Wait 1 second between posts to respect rate limits
-                await asyncio.sleep(1)
             
             except Exception as e:
                 print(f"  ✗ Error #{i}: {e}")
+    
+    await asyncio.gather(*(post_one(i, text) for i, text in enumerate(posts, 1)))
 
-async def error_handling_example():
+async def error_handling_example(session: aiohttp.ClientSession):
     """Demonstrate error handling"""
     print("\n🛡️ Error handling example...")
     
     # Try posting to an invalid platform
-    async with aiohttp.ClientSession() as session:
-        url = f"{BASE_URL}/api/post"
-        
-        # Invalid platform
-        data = {
-            "text": "Test post",
-            "platforms": ["invalid_platform", "facebook"]
-        }
-        
-        try:
-            async with session.post(url, json=data) as response:
-                results = await response.json()
-                
-                print("\n  Results:")
-                for result in results:
-                    if result["success"]:
-                        print(f"    ✓ {result['platform']}: Success")
-                    else:
-                        print(f"    ✗ {result['platform']}: {result['error']}")
-        
-        except Exception as e:
-            print(f"  Error: {e}")
+    url = f"{BASE_URL}/api/post"
+    
+    # Invalid platform
+    data = {
+        "text": "Test post",
+        "platforms": ["invalid_platform", "facebook"]
+    }
+    
+    try:
+        async with session.post(url, json=data) as response:
+            results = await response.json()
+            
+            print("\n  Results:")
+            for result in results:
+                if result["success"]:
+                    print(f"    ✓ {result['platform']}: Success")
+                else:
+                    print(f"    ✗ {result['platform']}: {result['error']}")
+    
+    except Exception as e:
+        print(f"  Error: {e}")
 
 async def main():
     """Run all examples"""
@@ -217,13 +216,17 @@ async def main():
     print("Multi-Platform API - Async Examples")
     print("=" * 60)
     
-    # Run examples (uncomment to execute)
-    # await batch_post_multiple_platforms()
-    # await sequential_posts_with_different_content()
-    # await bulk_upload_and_post()
-    # await monitor_post_status()
-    # await rate_limited_posting()
-    # await error_handling_example()
+    # One session (and one connection pool) shared by every example
+    connector = aiohttp.TCPConnector(limit=100, limit_per_host=32, keepalive_timeout=75)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # Run examples (uncomment to execute)
+        # await batch_post_multiple_platforms(session)
+        # await sequential_posts_with_different_content(session)
+        # await bulk_upload_and_post(session)
+        # await monitor_post_status(session)
+        # await rate_limited_posting(session)
+        # await error_handling_example(session)
+        pass
     
     print("\n" + "=" * 60)
     print("To run specific examples, uncomment the await calls in main()")
@@ -2,104 +2,101 @@
 Example: Post to Multiple Social Media Platforms
 """
 
+import atexit
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
 # API base URL
 BASE_URL = "http://localhost:8000"
 
+# Shared session so every example reuses pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=50))
+SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=50))
+atexit.register(SESSION.close)
+
+def _call(method: str, path: str, **kwargs):
+    """Send a request through SESSION and return the parsed JSON, or None on error"""
+    try:
+        response = SESSION.request(method, f"{BASE_URL}{path}", **kwargs)
+        response.raise_for_status()
+        return response.json()
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Error: {e}")
+        return None
+
 def post_to_multiple_platforms():
     """Post to multiple platforms at once"""
     print("📤 Posting to multiple platforms...")
     
-    url = f"{BASE_URL}/api/post"
-    
     data = {
         "text": "Hello from Multi-Platform API! 🚀\n\nThis is a test post from our new API.",
         "platforms": ["facebook", "instagram", "x", "threads"],
         "media_urls": ["https://picsum.photos/800/600"]
     }
     
-    try:
-        response = requests.post(url, json=data)
-        response.raise_for_status()
-        results = response.json()
-        
-        print("\n✅ Results:")
-        for result in results:
-            if result["success"]:
-                print(f"  ✓ {result['platform']}: Posted successfully (ID: {result['post_id']})")
-            else:
-                print(f"  ✗ {result['platform']}: Failed - {result['error']}")
+    results = _call("post", "/api/post", json=data)
+    if results is None:
+        return
     
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error: {e}")
+    print("\n✅ Results:")
+    for result in results:
+        if result["success"]:
+            print(f"  ✓ {result['platform']}: Posted successfully (ID: {result['post_id']})")
+        else:
+            print(f"  ✗ {result['platform']}: Failed - {result['error']}")
 
 def post_to_single_platform():
     """Post to a single platform"""
     print("\n📤 Posting to Facebook only...")
     
-    url = f"{BASE_URL}/api/post/facebook"
-    
     data = {
         "text": "This is a Facebook-only post!",
         "media_urls": "https://picsum.photos/800/600"
     }
     
-    try:
-        response = requests.post(url, data=data)
-        response.raise_for_status()
-        result = response.json()
-        
-        if result["success"]:
-            print(f"✅ Posted successfully! Post ID: {result['post_id']}")
-        else:
-            print(f"❌ Failed: {result['error']}")
+    result = _call("post", "/api/post/facebook", data=data)
+    if result is None:
+        return
     
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error: {e}")
+    if result["success"]:
+        print(f"✅ Posted successfully! Post ID: {result['post_id']}")
+    else:
+        print(f"❌ Failed: {result['error']}")
 
 def upload_and_post():
     """Upload media file and then post"""
     print("\n📤 Uploading media file...")
     
     # First, upload a file
-    upload_url = f"{BASE_URL}/api/upload"
-    
     # Note: You need to have an actual file to upload
     # files = {'file': open('path/to/your/image.jpg', 'rb')}
-    # response = requests.post(upload_url, files=files)
+    # _call("post", "/api/upload", files=files)
     
     # For this example, we'll use a URL instead
     print("  (Using direct URL instead of upload)")
     
     # Then post with the uploaded file
-    post_url = f"{BASE_URL}/api/post"
-    
     data = {
         "text": "Posted with uploaded media! 📸",
         "platforms": ["facebook", "instagram"],
         "media_urls": ["https://picsum.photos/1080/1080"]
     }
     
-    try:
-        response = requests.post(post_url, json=data)
-        response.raise_for_status()
-        results = response.json()
-        
-        print("✅ Post results:")
-        for result in results:
-            print(f"  {result['platform']}: {result['message']}")
+    results = _call("post", "/api/post", json=data)
+    if results is None:
+        return
     
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error: {e}")
+    print("✅ Post results:")
+    for result in results:
+        print(f"  {result['platform']}: {result['message']}")
 
 def scheduled_post():
     """Create a scheduled post"""
     print("\n📅 Creating scheduled post...")
     
-    url = f"{BASE_URL}/api/post"
-    
     # Schedule for 1 hour from now (Unix timestamp)
     import time
     schedule_time = int(time.time()) + 3600
@@ -111,58 +108,42 @@ def scheduled_post():
         "schedule_time": str(schedule_time)
     }
     
-    try:
-        response = requests.post(url, json=data)
-        response.raise_for_status()
-        results = response.json()
-        
-        print("✅ Scheduled post results:")
-        for result in results:
-            if result["success"]:
-                print(f"  ✓ {result['platform']}: Scheduled successfully")
-            else:
-                print(f"  ✗ {result['platform']}: {result['error']}")
+    results = _call("post", "/api/post", json=data)
+    if results is None:
+        return
     
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error: {e}")
+    print("✅ Scheduled post results:")
+    for result in results:
+        if result["success"]:
+            print(f"  ✓ {result['platform']}: Scheduled successfully")
+        else:
+            print(f"  ✗ {result['platform']}: {result['error']}")
 
 def check_api_health():
     """Check API health status"""
     print("\n🏥 Checking API health...")
     
-    url = f"{BASE_URL}/health"
-    
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        health = response.json()
-        
-        print(f"✅ API Status: {health['status']}")
-        print(f"   Available platforms: {', '.join(health['platforms_available'])}")
+    health = _call("get", "/health")
+    if health is None:
+        return
     
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error: {e}")
+    print(f"✅ API Status: {health['status']}")
+    print(f"   Available platforms: {', '.join(health['platforms_available'])}")
 
 def get_platform_info():
     """Get information about supported platforms"""
     print("\n📱 Getting platform information...")
     
-    url = f"{BASE_URL}/api/platforms"
+    data = _call("get", "/api/platforms")
+    if data is None:
+        return
     
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        print("✅ Supported Platforms:")
-        for platform in data['platforms']:
-            print(f"\n  {platform['name']} ({platform['id']})")
-            print(f"    - {platform['description']}")
-            print(f"    - Media: {platform['supports_media']}, Video: {platform['supports_video']}")
-            print(f"    - Scheduling: {platform['supports_scheduling']}")
-    
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error: {e}")
+    print("✅ Supported Platforms:")
+    for platform in data['platforms']:
+        print(f"\n  {platform['name']} ({platform['id']})")
+        print(f"    - {platform['description']}")
+        print(f"    - Media: {platform['supports_media']}, Video: {platform['supports_video']}")
+        print(f"    - Scheduling: {platform['supports_scheduling']}")
 
 if __name__ == "__main__":
     print("=" * 60)
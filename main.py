@@ -4,14 +4,25 @@ Supports: Facebook, Instagram, TikTok, X (Twitter), Threads, YouTube
 """
 
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi.responses import ORJSONResponse
+from pydantic import AfterValidator, BaseModel, Field, TypeAdapter, ValidationError
+from typing import Annotated, Optional, List
+from urllib.parse import urlsplit
 import uvicorn
+import aiofiles
+import asyncio
+from enum import IntEnum
 from datetime import datetime
 import os
+import time
+import uuid
+
+from config import Config
 
 # Import platform modules
+from platforms.base_poster import BasePoster, create_client
 from platforms.facebook_api import FacebookPoster
 from platforms.instagram_api import InstagramPoster
 from platforms.tiktok_api import TikTokPoster
@@ -22,23 +33,42 @@ from platforms.youtube_api import YouTubePoster
 app = FastAPI(
     title="Multi-Platform Social Media Posting API",
     description="API để đăng bài lên 6 nền tảng: Facebook, Instagram, TikTok, X, Threads, YouTube",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=Config.CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=Config.CORS_METHODS,
+    allow_headers=Config.CORS_HEADERS,
 )
 
+# Max number of media URLs accepted per post
+MAX_MEDIA_URLS = 10
+
+# Read size used when streaming uploaded files to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def _check_media_url(url: str) -> str:
+    """Accept absolute http(s) URLs verbatim, with no length cap or normalization"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.netloc:
+        raise ValueError("media URL must be an absolute http(s) URL")
+    return url
+
+# Media URLs are validated once here and handed to the posters unchanged
+MediaUrl = Annotated[str, AfterValidator(_check_media_url)]
+MediaUrls = Annotated[List[MediaUrl], Field(max_length=MAX_MEDIA_URLS)]
+MEDIA_URLS_ADAPTER = TypeAdapter(MediaUrls)
+
 # Pydantic models
 class PostContent(BaseModel):
     text: str
     platforms: List[str]  # ['facebook', 'instagram', 'tiktok', 'x', 'threads', 'youtube']
-    media_urls: Optional[List[str]] = None
+    media_urls: Optional[MediaUrls] = None
     schedule_time: Optional[str] = None
 
 class AuthCredentials(BaseModel):
@@ -55,16 +85,108 @@ class PostResponse(BaseModel):
     message: str
     error: Optional[str] = None
 
-# Initialize platform posters
-platform_posters = {
-    'facebook': FacebookPoster(),
-    'instagram': InstagramPoster(),
-    'tiktok': TikTokPoster(),
-    'x': XPoster(),
-    'threads': ThreadsPoster(),
-    'youtube': YouTubePoster()
+# Static platform metadata served by /api/platforms
+PLATFORMS_INFO = {
+    "platforms": [
+        {
+            "id": "facebook",
+            "name": "Facebook",
+            "description": "Đăng bài lên Facebook Page hoặc Profile",
+            "supports_media": True,
+            "supports_video": True,
+            "supports_scheduling": True
+        },
+        {
+            "id": "instagram",
+            "name": "Instagram",
+            "description": "Đăng bài lên Instagram Feed, Stories, Reels",
+            "supports_media": True,
+            "supports_video": True,
+            "supports_scheduling": True
+        },
+        {
+            "id": "tiktok",
+            "name": "TikTok",
+            "description": "Đăng video lên TikTok",
+            "supports_media": False,
+            "supports_video": True,
+            "supports_scheduling": True
+        },
+        {
+            "id": "x",
+            "name": "X (Twitter)",
+            "description": "Đăng tweet lên X",
+            "supports_media": True,
+            "supports_video": True,
+            "supports_scheduling": False
+        },
+        {
+            "id": "threads",
+            "name": "Threads",
+            "description": "Đăng bài lên Threads",
+            "supports_media": True,
+            "supports_video": True,
+            "supports_scheduling": False
+        },
+        {
+            "id": "youtube",
+            "name": "YouTube",
+            "description": "Upload video lên YouTube",
+            "supports_media": False,
+            "supports_video": True,
+            "supports_scheduling": True
+        }
+    ]
 }
 
+class PlatformID(IntEnum):
+    """Index of each supported platform in POSTER_CLASSES"""
+    facebook = 0
+    instagram = 1
+    tiktok = 2
+    x = 3
+    threads = 4
+    youtube = 5
+
+# Platform posters indexed by PlatformID, instantiated on first use by get_poster()
+POSTER_CLASSES = (
+    FacebookPoster,
+    InstagramPoster,
+    TikTokPoster,
+    XPoster,
+    ThreadsPoster,
+    YouTubePoster
+)
+_posters = [None] * len(POSTER_CLASSES)
+
+NAME_TO_ID = {platform_id.name: platform_id for platform_id in PlatformID}
+UNSUPPORTED_PLATFORM_ERROR = "Platform '{}' is not supported"
+
+def get_poster(platform_id: PlatformID):
+    """Return the shared poster instance for a supported platform"""
+    poster = _posters[platform_id]
+    if poster is None:
+        poster = _posters[platform_id] = POSTER_CLASSES[platform_id]()
+    return poster
+
+@app.on_event("startup")
+async def open_http_clients():
+    """Create the HTTP connection pool shared by all platform posters"""
+    app.state.http = create_client()
+    BasePoster.set_client(app.state.http)
+    
+    # Connect to configured platforms in the background while startup finishes
+    app.state.warmup = asyncio.gather(*(
+        get_poster(NAME_TO_ID[platform]).warmup()
+        for platform in Config.AVAILABLE_PLATFORMS
+    ))
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Close the shared HTTP connection pool"""
+    app.state.warmup.cancel()
+    await BasePoster.close_shared_client()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -85,10 +207,59 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "platforms_available": list(platform_posters.keys())
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "platforms_available": list(Config.AVAILABLE_PLATFORMS)
     }
 
+def _post_response(
+    success: bool,
+    platform: str,
+    message: str,
+    post_id: Optional[str] = None,
+    error: Optional[str] = None
+) -> dict:
+    """Build a PostResponse-shaped dict, skipping pydantic validation on the hot path"""
+    return {
+        "success": success,
+        "platform": platform,
+        "post_id": post_id,
+        "message": message,
+        "error": error
+    }
+
+def _unsupported_response(platform: str) -> dict:
+    """Build the error response for a platform that is not supported"""
+    return _post_response(
+        success=False,
+        platform=platform,
+        message="Platform not supported",
+        error=UNSUPPORTED_PLATFORM_ERROR.format(platform)
+    )
+
+async def _post_to_platform(platform: str, content: PostContent) -> dict:
+    """Post content to one supported platform, turning failures into an error response"""
+    try:
+        poster = get_poster(NAME_TO_ID[platform])
+        post_result = await poster.create_post(
+            text=content.text,
+            media_urls=content.media_urls,
+            schedule_time=content.schedule_time
+        )
+        
+        return _post_response(
+            success=True,
+            platform=platform,
+            post_id=post_result.get('post_id'),
+            message=f"Successfully posted to {platform}"
+        )
+    except Exception as e:
+        return _post_response(
+            success=False,
+            platform=platform,
+            message=f"Failed to post to {platform}",
+            error=str(e)
+        )
+
 @app.post("/api/post", response_model=List[PostResponse])
 async def post_to_platforms(content: PostContent):
     """
@@ -100,43 +271,24 @@ async def post_to_platforms(content: PostContent):
     - media_urls: Danh sách URL của ảnh/video (optional)
     - schedule_time: Thời gian hẹn đăng (optional, format: ISO 8601)
     """
-    results = []
+    unsupported = {
+        platform: _unsupported_response(platform)
+        for platform in content.platforms
+        if platform not in NAME_TO_ID
+    }
+    supported = [platform for platform in content.platforms if platform not in unsupported]
     
-    for platform in content.platforms:
-        if platform not in platform_posters:
-            results.append(PostResponse(
-                success=False,
-                platform=platform,
-                message="Platform not supported",
-                error=f"Platform '{platform}' is not supported"
-            ))
-            continue
-        
-        try:
-            poster = platform_posters[platform]
-            post_result = await poster.create_post(
-                text=content.text,
-                media_urls=content.media_urls,
-                schedule_time=content.schedule_time
-            )
-            
-            results.append(PostResponse(
-                success=True,
-                platform=platform,
-                post_id=post_result.get('post_id'),
-                message=f"Successfully posted to {platform}",
-                error=None
-            ))
-        except Exception as e:
-            results.append(PostResponse(
-                success=False,
-                platform=platform,
-                post_id=None,
-                message=f"Failed to post to {platform}",
-                error=str(e)
-            ))
+    # Platforms are independent, so post to all of them concurrently
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(_post_to_platform(platform, content)) for platform in supported]
+    posted = (task.result() for task in tasks)
     
-    return results
+    # Keep results in the same order as content.platforms; results are already
+    # PostResponse-shaped, so return them directly instead of re-validating
+    return ORJSONResponse([
+        unsupported[platform] if platform in unsupported else next(posted)
+        for platform in content.platforms
+    ])
 
 @app.post("/api/post/{platform}", response_model=PostResponse)
 async def post_to_single_platform(
@@ -154,33 +306,42 @@ async def post_to_single_platform(
     - media_urls: URL của ảnh/video (comma-separated)
     - schedule_time: Thời gian hẹn đăng (ISO 8601 format)
     """
-    if platform not in platform_posters:
-        raise HTTPException(status_code=400, detail=f"Platform '{platform}' is not supported")
+    platform_id = NAME_TO_ID.get(platform)
+    if platform_id is None:
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_PLATFORM_ERROR.format(platform))
     
     try:
-        media_list = media_urls.split(',') if media_urls else None
-        poster = platform_posters[platform]
+        media_list = MEDIA_URLS_ADAPTER.validate_python([
+            url.strip() for url in media_urls.split(',') if url.strip()
+        ] if media_urls else [])
+    except ValidationError as e:
+        # Same 422 as an invalid /api/post body
+        raise RequestValidationError([
+            {**error, 'loc': ('body', 'media_urls', *error['loc'])}
+            for error in e.errors()
+        ])
+    
+    try:
+        poster = get_poster(platform_id)
         post_result = await poster.create_post(
             text=text,
             media_urls=media_list,
             schedule_time=schedule_time
         )
         
-        return PostResponse(
+        return ORJSONResponse(_post_response(
             success=True,
             platform=platform,
             post_id=post_result.get('post_id'),
-            message=f"Successfully posted to {platform}",
-            error=None
-        )
+            message=f"Successfully posted to {platform}"
+        ))
     except Exception as e:
-        return PostResponse(
+        return ORJSONResponse(_post_response(
             success=False,
             platform=platform,
-            post_id=None,
             message=f"Failed to post to {platform}",
             error=str(e)
-        )
+        ))
 
 @app.post("/api/upload")
 async def upload_media(file: UploadFile = File(...)):
@@ -192,16 +353,20 @@ async def upload_media(file: UploadFile = File(...)):
         os.makedirs("uploads", exist_ok=True)
         
         # Save file
-        file_path = f"uploads/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Millisecond timestamp plus a random suffix keeps names unique without strftime
+        file_path = f"uploads/{int(time.time() * 1000):013d}_{uuid.uuid4().hex[:8]}_{file.filename}"
+        # Copy in chunks so large videos never sit in memory as a whole
+        file_size = 0
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await buffer.write(chunk)
+                file_size += len(chunk)
         
         return {
             "success": True,
             "filename": file.filename,
             "file_path": file_path,
-            "file_size": len(content),
+            "file_size": file_size,
             "message": "File uploaded successfully"
         }
     except Exception as e:
@@ -216,11 +381,12 @@ async def authenticate_platform(platform: str, credentials: AuthCredentials):
     - platform: Tên nền tảng
     - credentials: Thông tin xác thực (access_token, api_key, api_secret, etc.)
     """
-    if platform not in platform_posters:
-        raise HTTPException(status_code=400, detail=f"Platform '{platform}' is not supported")
+    platform_id = NAME_TO_ID.get(platform)
+    if platform_id is None:
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_PLATFORM_ERROR.format(platform))
     
     try:
-        poster = platform_posters[platform]
+        poster = get_poster(platform_id)
         auth_result = await poster.authenticate(
             access_token=credentials.access_token,
             api_key=credentials.api_key,
@@ -242,58 +408,7 @@ async def get_supported_platforms():
     """
     Lấy danh sách các nền tảng được hỗ trợ
     """
-    return {
-        "platforms": [
-            {
-                "id": "facebook",
-                "name": "Facebook",
-                "description": "Đăng bài lên Facebook Page hoặc Profile",
-                "supports_media": True,
-                "supports_video": True,
-                "supports_scheduling": True
-            },
-            {
-                "id": "instagram",
-                "name": "Instagram",
-                "description": "Đăng bài lên Instagram Feed, Stories, Reels",
-                "supports_media": True,
-                "supports_video": True,
-                "supports_scheduling": True
-            },
-            {
-                "id": "tiktok",
-                "name": "TikTok",
-                "description": "Đăng video lên TikTok",
-                "supports_media": False,
-                "supports_video": True,
-                "supports_scheduling": True
-            },
-            {
-                "id": "x",
-                "name": "X (Twitter)",
-                "description": "Đăng tweet lên X",
-                "supports_media": True,
-                "supports_video": True,
-                "supports_scheduling": False
-            },
-            {
-                "id": "threads",
-                "name": "Threads",
-                "description": "Đăng bài lên Threads",
-                "supports_media": True,
-                "supports_video": True,
-                "supports_scheduling": False
-            },
-            {
-                "id": "youtube",
-                "name": "YouTube",
-                "description": "Upload video lên YouTube",
-                "supports_media": False,
-                "supports_video": True,
-                "supports_scheduling": True
-            }
-        ]
-    }
+    return PLATFORMS_INFO
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -2,6 +2,8 @@
 Platform modules for multi-platform posting
 """
 
+from . import runtime  # noqa: F401  (installs uvloop before any loop starts)
+from .base_poster import PostError
 from .facebook_api import FacebookPoster
 from .instagram_api import InstagramPoster
 from .tiktok_api import TikTokPoster
@@ -10,6 +12,7 @@ from .threads_api import ThreadsPoster
 from .youtube_api import YouTubePoster
 
 __all__ = [
+    'PostError',
     'FacebookPoster',
     'InstagramPoster',
     'TikTokPoster',
@@ -0,0 +1,10 @@
+"""
+Load the .env file once per process
+"""
+
+import os
+from dotenv import load_dotenv
+
+if not os.environ.get("_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["_DOTENV_LOADED"] = "1"
@@ -3,21 +3,381 @@ Base class for all platform posters
 """
 
 from abc import ABC, abstractmethod
-from typing import Optional, List, Dict
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import AsyncIterator, Optional, List, Dict
+from urllib.parse import urlencode
+import asyncio
+import gzip
+import hashlib
+import httpx
+import orjson
 import os
-from dotenv import load_dotenv
+import random
+import re
+import tempfile
+import time
+import zlib
+from . import _env  # noqa: F401  (loads .env once per process)
 
-load_dotenv()
+# Verified tokens are trusted for AUTH_TTL seconds and refreshed in the
+# background once they are within AUTH_REFRESH_MARGIN seconds of expiring
+AUTH_TTL = 3600
+AUTH_REFRESH_MARGIN = 180
+
+# Verifications are also cached on disk so cold-started workers can skip them
+AUTH_CACHE_DIR = Path(os.getenv('AUTH_CACHE_DIR', '~/.miai_auth_cache')).expanduser()
+
+# Transient failures are retried with jittered exponential backoff
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 5
+
+# Methods that are safe to resend even if the first attempt reached the server
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+# Transport errors raised before the request was sent, safe to retry for any method
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+
+# Requests in flight per platform, so one post's uploads cannot starve the rest
+MAX_CONCURRENT_REQUESTS = 8
+
+# Media downloads streaming per platform. Separate from the request limit: a
+# download stays open while its uploads go out, and sharing one semaphore
+# would deadlock once every slot is held by a download
+MAX_CONCURRENT_DOWNLOADS = 4
+
+# Media is forwarded from its source URL to the platform in chunks of this size
+STREAM_CHUNK_SIZE = 1 << 20
+
+# Video file extension at the end of the URL path, before any query string
+VIDEO_URL_RE = re.compile(r'\.(?:mp4|mov|avi|m4v|webm)(?:$|\?)', re.IGNORECASE)
+
+# Sent with every request; compressed JSON responses are decoded transparently
+DEFAULT_HEADERS = {
+    'Accept-Encoding': 'gzip, br',
+    'User-Agent': 'MiAI-Crawler/1.0'
+}
+
+# Media downloads are forwarded as-is, so Content-Length must be the real
+# size of the file; ask the source not to compress them
+DOWNLOAD_HEADERS = {'Accept-Encoding': 'identity'}
+
+# Error bodies quoted in exception messages are cut to this many bytes
+ERROR_BODY_LIMIT = 512
+
+# For request bodies pre-encoded with BasePoster._form_body
+FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+class PostError(Exception):
+    """Raised when a platform rejects a request or the request cannot be sent"""
+
+def backoff_delay(attempt: int) -> float:
+    """Jittered exponential backoff before retry number attempt + 1"""
+    return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header, if one is present"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def error_body(response: httpx.Response) -> str:
+    """Status and truncated raw body of a failed response, for error messages"""
+    return f"{response.status_code} {response.content[:ERROR_BODY_LIMIT]!r}"
+
+def declared_size(response: httpx.Response, limit: int) -> Optional[int]:
+    """Content-Length of a media download if it reports one, rejected if over limit"""
+    size = int(response.headers.get('Content-Length', 0)) or None
+    if size is not None and size > limit:
+        raise PostError(f"Media is {size} bytes, over the {limit} byte limit")
+    return size
+
+def media_size(response: httpx.Response, limit: int) -> int:
+    """Declared size of a media download, rejected before any upload if unknown or over limit"""
+    size = declared_size(response, limit)
+    if size is None:
+        raise PostError("Media URL must report Content-Length")
+    return size
+
+async def read_media(response: httpx.Response, limit: int) -> bytes:
+    """Read a whole media download, failing as soon as it exceeds limit bytes"""
+    declared_size(response, limit)
+    parts = []
+    received = 0
+    async for part in response.aiter_bytes():
+        received += len(part)
+        if received > limit:
+            raise PostError(f"Media is over the {limit} byte limit")
+        parts.append(part)
+    return b''.join(parts)
+
+def create_client() -> httpx.AsyncClient:
+    """Create an HTTP/2 client with a pooled, keep-alive connection limit"""
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=75
+        ),
+        headers=DEFAULT_HEADERS,
+        timeout=30.0
+    )
 
 class BasePoster(ABC):
     """Base class for platform-specific posters"""
     
+    # No per-instance __dict__; subclasses declare their own attributes
+    __slots__ = (
+        'platform_name', 'access_token', 'api_key', 'api_secret', '_token_kv',
+        '_auth_lock', '_auth_task', '_auth_refresh_task', '_auth_expiry',
+        '_env_creds', '_host_sem', '_download_sem'
+    )
+    
+    # Connection pool shared by every poster in the process; set by the
+    # application at startup, or created on first use outside of it
+    _shared_client: Optional[httpx.AsyncClient] = None
+    
+    # API origin that warmup() connects to ahead of the first real call
+    warmup_url: Optional[str] = None
+    
     def __init__(self, platform_name: str):
         self.platform_name = platform_name
         self.access_token = None
         self.api_key = None
         self.api_secret = None
-        self.authenticated = False
+        self._token_kv = ''  # url-encoded access_token, set by authenticate
+        self._auth_lock = asyncio.Lock()
+        self._auth_task: Optional[asyncio.Task] = None
+        self._auth_refresh_task: Optional[asyncio.Task] = None
+        self.authenticated = False  # sets _auth_expiry
+        self._host_sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._download_sem = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        
+        # Environment is fixed for the life of the process, read it once
+        upper = platform_name.upper()
+        self._env_creds = {
+            'access_token': os.getenv(f'{upper}_ACCESS_TOKEN'),
+            'api_key': os.getenv(f'{upper}_API_KEY'),
+            'api_secret': os.getenv(f'{upper}_API_SECRET'),
+            'client_id': os.getenv(f'{upper}_CLIENT_ID'),
+            'client_secret': os.getenv(f'{upper}_CLIENT_SECRET'),
+        }
+    
+    @property
+    def authenticated(self) -> bool:
+        """Whether the last successful verification is still within AUTH_TTL"""
+        return time.monotonic() < self._auth_expiry
+    
+    @authenticated.setter
+    def authenticated(self, value: bool) -> None:
+        self._auth_expiry = time.monotonic() + AUTH_TTL if value else 0.0
+    
+    async def ensure_authenticated(self) -> None:
+        """
+        Authenticate unless a cached verification is still fresh
+        
+        Stale (close to expiry) verifications are refreshed in the background
+        while the current token keeps being used.
+        """
+        remaining = self._auth_expiry - time.monotonic()
+        if remaining > 0:
+            if remaining < AUTH_REFRESH_MARGIN and (
+                self._auth_refresh_task is None or self._auth_refresh_task.done()
+            ):
+                self._auth_refresh_task = asyncio.create_task(self._refresh_auth())
+            return
+        
+        async with self._auth_lock:
+            # Another caller may have authenticated while we waited
+            if not self.authenticated:
+                await self.authenticate(access_token=self.access_token)
+    
+    def prefetch_authentication(self) -> asyncio.Task:
+        """
+        Start ensure_authenticated() in the background and return its task
+        
+        Lets authentication overlap other I/O such as downloading media; a later
+        ensure_authenticated() call joins the in-flight attempt via the lock.
+        """
+        if self._auth_task is None or self._auth_task.done():
+            self._auth_task = asyncio.create_task(self.ensure_authenticated())
+            # Failures surface from the next ensure_authenticated() call
+            self._auth_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._auth_task
+    
+    def _auth_cache_path(self, scope: str) -> Path:
+        """Cache file for this token verified against scope (the verification URL)"""
+        key = hashlib.blake2b(
+            f"{scope}\n{self.access_token}".encode(), digest_size=16
+        ).hexdigest()
+        return AUTH_CACHE_DIR / f"{key}.json.gz"
+    
+    def _load_auth_cache(self, scope: str) -> Optional[Dict]:
+        """
+        Return a cached verification result and mark the poster authenticated
+        
+        Entries close to expiry are ignored so the background refresh still
+        re-verifies the token over the network.
+        """
+        try:
+            entry = orjson.loads(gzip.decompress(self._auth_cache_path(scope).read_bytes()))
+            remaining = entry['expiry'] - time.time()
+            result = entry['result']
+        except (
+            OSError, EOFError, zlib.error, gzip.BadGzipFile,
+            orjson.JSONDecodeError, ValueError, KeyError, TypeError
+        ):
+            # Missing, truncated or foreign files are a cache miss
+            return None
+        if remaining <= AUTH_REFRESH_MARGIN:
+            return None
+        self._auth_expiry = time.monotonic() + remaining
+        return result
+    
+    def _store_auth_cache(self, scope: str, result: Dict) -> None:
+        """Cache a successful verification result for AUTH_TTL seconds"""
+        data = gzip.compress(orjson.dumps({
+            'expiry': time.time() + AUTH_TTL,
+            'result': result
+        }))
+        try:
+            AUTH_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+            # Written aside and renamed into place, so concurrent readers never
+            # see a partial file and a crash mid-write leaves the old entry
+            fd, tmp_path = tempfile.mkstemp(dir=AUTH_CACHE_DIR, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, self._auth_cache_path(scope))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            pass
+    
+    async def _refresh_auth(self) -> None:
+        """Re-verify the current token, keeping it usable if verification fails"""
+        async with self._auth_lock:
+            expiry = self._auth_expiry
+            try:
+                await self.authenticate(access_token=self.access_token)
+            except Exception:
+                # authenticate() marks the poster unauthenticated when it fails
+                self._auth_expiry = expiry
+    
+    @classmethod
+    def set_client(cls, client: Optional[httpx.AsyncClient]) -> None:
+        """Share one HTTP/2 client (and its connection pool) across all posters"""
+        BasePoster._shared_client = client
+    
+    @classmethod
+    async def close_shared_client(cls) -> None:
+        """Close the process-wide client; call once at shutdown, never per poster"""
+        client = BasePoster._shared_client
+        BasePoster._shared_client = None
+        if client is not None:
+            await client.aclose()
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Return the process-wide HTTP/2 client, creating it on first use"""
+        client = BasePoster._shared_client
+        if client is None or client.is_closed:
+            client = BasePoster._shared_client = create_client()
+        return client
+    
+    @asynccontextmanager
+    async def _download(self, url: str) -> AsyncIterator[httpx.Response]:
+        """Stream a media file from its source URL, without content encoding"""
+        client = await self._get_client()
+        async with self._download_sem:
+            async with client.stream('GET', url, headers=DOWNLOAD_HEADERS) as response:
+                yield response
+    
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        *,
+        idempotent: Optional[bool] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request on the pooled client, retrying transient failures
+        
+        429/5xx responses and transport errors are retried up to MAX_RETRIES
+        times, honouring Retry-After; the connection stays pooled in between.
+        Requests that are not idempotent (by default, any method outside
+        IDEMPOTENT_METHODS) are only retried when they provably did not take
+        effect: connection failures, 429, and 503 with Retry-After. The last
+        response is returned as-is for the caller to handle. At most
+        MAX_CONCURRENT_REQUESTS requests per poster are in flight at once.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        client = await self._get_client()
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self._host_sem:
+                    response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == MAX_RETRIES or not (idempotent or isinstance(e, UNSENT_ERRORS)):
+                    raise
+                delay = None
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    return response
+                delay = _retry_after(response)
+                if not idempotent and not (
+                    response.status_code == 429
+                    or (response.status_code == 503 and delay is not None)
+                ):
+                    return response
+                if delay is not None and delay > RETRY_MAX_DELAY:
+                    return response
+            
+            await asyncio.sleep(backoff_delay(attempt) if delay is None else delay)
+    
+    async def warmup(self) -> None:
+        """
+        Open a pooled connection to warmup_url
+        
+        Resolves DNS and completes the TCP/TLS handshake early, so the first
+        real API call reuses a hot connection. Failures are ignored.
+        """
+        if self.warmup_url is None:
+            return
+        try:
+            client = await self._get_client()
+            await client.head(self.warmup_url)
+        except httpx.HTTPError:
+            pass
+    
+    async def aclose(self) -> None:
+        """
+        Stop this poster's background work
+        
+        The shared client is left open for other posters' in-flight requests;
+        close it with close_shared_client() at shutdown.
+        """
+        for task in (self._auth_task, self._auth_refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
     
     @abstractmethod
     async def authenticate(
@@ -46,15 +406,13 @@ class BasePoster(ABC):
         """
         pass
     
+    def _form_body(self, fields: Dict) -> str:
+        """URL-encode fields and append the pre-encoded access token"""
+        return f"{urlencode(fields)}&{self._token_kv}"
+    
     def get_credentials_from_env(self) -> Dict:
         """Get credentials from environment variables"""
-        return {
-            'access_token': os.getenv(f'{self.platform_name.upper()}_ACCESS_TOKEN'),
-            'api_key': os.getenv(f'{self.platform_name.upper()}_API_KEY'),
-            'api_secret': os.getenv(f'{self.platform_name.upper()}_API_SECRET'),
-            'client_id': os.getenv(f'{self.platform_name.upper()}_CLIENT_ID'),
-            'client_secret': os.getenv(f'{self.platform_name.upper()}_CLIENT_SECRET'),
-        }
+        return self._env_creds
     
     def validate_media_url(self, url: str) -> bool:
         """Validate media URL"""
@@ -62,6 +420,10 @@ class BasePoster(ABC):
             return False
         return url.startswith(('http://', 'https://'))
     
+    def is_video_url(self, url: str) -> bool:
+        """Check whether a media URL points to a video file"""
+        return VIDEO_URL_RE.search(url) is not None
+    
     def format_response(self, success: bool, post_id: Optional[str] = None, message: str = "", error: Optional[str] = None) -> Dict:
         """Format response dictionary"""
         return {
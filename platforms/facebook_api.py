@@ -3,18 +3,44 @@ Facebook API Poster
 Uses Facebook Graph API to post to Facebook Pages and Profiles
 """
 
-import aiohttp
+import httpx
+import orjson
 import os
 from typing import Optional, List, Dict
-from .base_poster import BasePoster
+from urllib.parse import urlencode
+from .base_poster import BasePoster, PostError, FORM_HEADERS, error_body
+
+# Environment is fixed for the life of the process, read it once
+FACEBOOK_ACCESS_TOKEN = os.getenv('FACEBOOK_ACCESS_TOKEN')
+FACEBOOK_PAGE_ID = os.getenv('FACEBOOK_PAGE_ID')
+
+# Graph API batches hold up to 50 sub-requests; one is the feed post
+MAX_BATCH_PHOTOS = 49
 
 class FacebookPoster(BasePoster):
     """Facebook posting functionality"""
     
+    __slots__ = (
+        'graph_api_url', 'page_id', '_me_url', '_feed_path', '_photos_path',
+        '_feed_url', '_photos_url'
+    )
+    
+    warmup_url = "https://graph.facebook.com"
+    
     def __init__(self):
         super().__init__('facebook')
         self.graph_api_url = "https://graph.facebook.com/v18.0"
-        self.page_id = os.getenv('FACEBOOK_PAGE_ID')
+        self.page_id = FACEBOOK_PAGE_ID
+        self._me_url = f"{self.graph_api_url}/me"
+        self._set_page_urls()
+    
+    def _set_page_urls(self) -> None:
+        """Build endpoint URLs for the current page (or user feed)"""
+        owner = self.page_id or "me"
+        self._feed_path = f"{owner}/feed"
+        self._photos_path = f"{owner}/photos"
+        self._feed_url = f"{self.graph_api_url}/{self._feed_path}"
+        self._photos_url = f"{self.graph_api_url}/{self._photos_path}"
     
     async def authenticate(
         self,
@@ -29,37 +55,46 @@ class FacebookPoster(BasePoster):
         """
         try:
             # Use provided token or get from environment
-            self.access_token = access_token or os.getenv('FACEBOOK_ACCESS_TOKEN')
+            self.access_token = access_token or FACEBOOK_ACCESS_TOKEN
             
             if additional_params and 'page_id' in additional_params:
                 self.page_id = additional_params['page_id']
-            else:
-                self.page_id = self.page_id or os.getenv('FACEBOOK_PAGE_ID')
+            self._set_page_urls()
             
             if not self.access_token:
-                raise Exception("Facebook access token is required")
+                raise PostError("Facebook access token is required")
+            self._token_kv = urlencode({'access_token': self.access_token})
+            
+            # Reuse a recent verification from another worker, if any
+            cached = self._load_auth_cache(self._me_url)
+            if cached is not None:
+                return cached
             
             # Verify token by making a test API call
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.graph_api_url}/me",
-                    params={'access_token': self.access_token}
-                ) as response:
-                    if response.status == 200:
-                        user_data = await response.json()
-                        self.authenticated = True
-                        return {
-                            'authenticated': True,
-                            'user_id': user_data.get('id'),
-                            'user_name': user_data.get('name')
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Authentication failed: {error_data}")
+            response = await self._request(
+                'GET',
+                self._me_url,
+                params={'access_token': self.access_token}
+            )
+            if response.status_code == 200:
+                user_data = orjson.loads(response.content)
+                self.authenticated = True
+                result = {
+                    'authenticated': True,
+                    'user_id': user_data.get('id'),
+                    'user_name': user_data.get('name')
+                }
+                self._store_auth_cache(self._me_url, result)
+                return result
+            else:
+                raise PostError(f"Authentication failed: {error_body(response)}")
         
-        except Exception as e:
+        except httpx.HTTPError as e:
             self.authenticated = False
-            raise Exception(f"Facebook authentication error: {str(e)}")
+            raise PostError(f"Facebook authentication error: {e}") from e
+        except Exception:
+            self.authenticated = False
+            raise
     
     async def create_post(
         self,
@@ -77,71 +112,115 @@ class FacebookPoster(BasePoster):
         """
         try:
             # Auto-authenticate if not already authenticated
-            if not self.authenticated:
-                await self.authenticate()
-            
-            # Determine endpoint (page or user feed)
-            endpoint = f"{self.page_id}/feed" if self.page_id else "me/feed"
+            await self.ensure_authenticated()
             
             # Prepare post data
             post_data = {
-                'message': text,
-                'access_token': self.access_token
+                'message': text
             }
             
+            # Add scheduling if provided
+            if schedule_time:
+                post_data['published'] = 'false'
+                post_data['scheduled_publish_time'] = schedule_time
+            
             # Add media if provided
-            if media_urls and len(media_urls) > 0:
+            if media_urls:
                 if len(media_urls) == 1:
                     # Single image/video
                     post_data['link'] = media_urls[0]
                 else:
-                    # Multiple images - use photos endpoint
-                    # Note: For multiple images, need to use batch upload
-                    post_data['attached_media'] = media_urls
-            
-            # Add scheduling if provided
-            if schedule_time:
-                post_data['published'] = False
-                post_data['scheduled_publish_time'] = schedule_time
+                    # Multiple images - upload and attach them in a single batch request
+                    return {
+                        'post_id': await self._post_with_photos(post_data, media_urls),
+                        'success': True,
+                        'platform': 'facebook'
+                    }
             
             # Make API request
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.graph_api_url}/{endpoint}",
-                    data=post_data
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        return {
-                            'post_id': result.get('id'),
-                            'success': True,
-                            'platform': 'facebook'
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Post failed: {error_data}")
+            response = await self._request(
+                'POST',
+                self._feed_url,
+                content=self._form_body(post_data),
+                headers=FORM_HEADERS
+            )
+            if response.status_code in [200, 201]:
+                result = orjson.loads(response.content)
+                return {
+                    'post_id': result.get('id'),
+                    'success': True,
+                    'platform': 'facebook'
+                }
+            else:
+                raise PostError(f"Post failed: {error_body(response)}")
         
-        except Exception as e:
-            raise Exception(f"Facebook post error: {str(e)}")
+        except httpx.HTTPError as e:
+            raise PostError(f"Facebook post error: {e}") from e
+    
+    async def _post_with_photos(self, post_data: Dict, media_urls: List[str]) -> str:
+        """
+        Upload unpublished photos and publish a feed post attaching them
+        
+        Everything goes through one Graph API batch call: each photo upload is
+        a named sub-request, and the feed post references their IDs with
+        JSONPath, so the whole post costs a single round trip.
+        """
+        batch = [
+            {
+                'method': 'POST',
+                'relative_url': self._photos_path,
+                'name': f'photo{i}',
+                'body': urlencode({'url': url, 'published': 'false'})
+            }
+            for i, url in enumerate(media_urls[:MAX_BATCH_PHOTOS])
+        ]
+        
+        # Graph only substitutes JSONPath references written literally, so
+        # these values are appended by hand instead of being url-encoded
+        feed_body = urlencode(post_data) + ''.join(
+            f'&attached_media[{i}]={{"media_fbid":"{{result=photo{i}:$.id}}"}}'
+            for i in range(len(batch))
+        )
+        batch.append({
+            'method': 'POST',
+            'relative_url': self._feed_path,
+            'body': feed_body
+        })
+        
+        feed_response = (await self._graph_batch(batch))[-1]
+        if not feed_response or feed_response.get('code') not in [200, 201]:
+            raise PostError(f"Post failed: {feed_response}")
+        return orjson.loads(feed_response['body']).get('id')
+    
+    async def _graph_batch(self, requests: List[Dict]) -> List[Optional[Dict]]:
+        """Send a Graph API batch request and return its sub-responses"""
+        response = await self._request(
+            'POST',
+            self.graph_api_url,
+            content=self._form_body({
+                'batch': orjson.dumps(requests).decode(),
+                'include_headers': 'false'
+            }),
+            headers=FORM_HEADERS
+        )
+        if response.status_code in [200, 201]:
+            return orjson.loads(response.content)
+        else:
+            raise PostError(f"Batch request failed: {error_body(response)}")
     
     async def upload_photo(self, photo_url: str) -> str:
         """Upload a photo and return photo ID"""
-        try:
-            endpoint = f"{self.page_id}/photos" if self.page_id else "me/photos"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.graph_api_url}/{endpoint}",
-                    data={
-                        'url': photo_url,
-                        'published': False,
-                        'access_token': self.access_token
-                    }
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        return result.get('id')
-                    else:
-                        raise Exception(f"Photo upload failed: {await response.text()}")
-        except Exception as e:
-            raise Exception(f"Photo upload error: {str(e)}")
+        response = await self._request(
+            'POST',
+            self._photos_url,
+            content=self._form_body({
+                'url': photo_url,
+                'published': 'false'
+            }),
+            headers=FORM_HEADERS
+        )
+        if response.status_code in [200, 201]:
+            result = orjson.loads(response.content)
+            return result.get('id')
+        else:
+            raise PostError(f"Photo upload failed: {error_body(response)}")
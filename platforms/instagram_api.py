@@ -3,18 +3,42 @@ Instagram API Poster
 Uses Instagram Graph API to post to Instagram Business/Creator accounts
 """
 
-import aiohttp
+import asyncio
+import httpx
+import orjson
 import os
 from typing import Optional, List, Dict
-from .base_poster import BasePoster
+from urllib.parse import urlencode
+from .base_poster import BasePoster, PostError, FORM_HEADERS, error_body
+
+# Environment is fixed for the life of the process, read it once
+INSTAGRAM_ACCESS_TOKEN = os.getenv('INSTAGRAM_ACCESS_TOKEN')
+INSTAGRAM_ACCOUNT_ID = os.getenv('INSTAGRAM_ACCOUNT_ID')
+
+# Instagram allows up to 10 items in a carousel
+MAX_CAROUSEL_ITEMS = 10
 
 class InstagramPoster(BasePoster):
     """Instagram posting functionality"""
     
+    __slots__ = (
+        'graph_api_url', 'instagram_account_id', '_account_url', '_media_url',
+        '_media_publish_url'
+    )
+    
+    warmup_url = "https://graph.facebook.com"
+    
     def __init__(self):
         super().__init__('instagram')
         self.graph_api_url = "https://graph.facebook.com/v18.0"
-        self.instagram_account_id = os.getenv('INSTAGRAM_ACCOUNT_ID')
+        self.instagram_account_id = INSTAGRAM_ACCOUNT_ID
+        self._set_account_urls()
+    
+    def _set_account_urls(self) -> None:
+        """Build endpoint URLs for the current Instagram account"""
+        self._account_url = f"{self.graph_api_url}/{self.instagram_account_id}"
+        self._media_url = f"{self._account_url}/media"
+        self._media_publish_url = f"{self._account_url}/media_publish"
     
     async def authenticate(
         self,
@@ -28,41 +52,50 @@ class InstagramPoster(BasePoster):
         Requires: access_token and instagram_account_id
         """
         try:
-            self.access_token = access_token or os.getenv('INSTAGRAM_ACCESS_TOKEN')
+            self.access_token = access_token or INSTAGRAM_ACCESS_TOKEN
             
             if additional_params and 'instagram_account_id' in additional_params:
                 self.instagram_account_id = additional_params['instagram_account_id']
-            else:
-                self.instagram_account_id = self.instagram_account_id or os.getenv('INSTAGRAM_ACCOUNT_ID')
+            self._set_account_urls()
             
             if not self.access_token or not self.instagram_account_id:
-                raise Exception("Instagram access token and account ID are required")
+                raise PostError("Instagram access token and account ID are required")
+            self._token_kv = urlencode({'access_token': self.access_token})
+            
+            # Reuse a recent verification from another worker, if any
+            cached = self._load_auth_cache(self._account_url)
+            if cached is not None:
+                return cached
             
             # Verify credentials
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.graph_api_url}/{self.instagram_account_id}",
-                    params={
-                        'fields': 'id,username,account_type',
-                        'access_token': self.access_token
-                    }
-                ) as response:
-                    if response.status == 200:
-                        account_data = await response.json()
-                        self.authenticated = True
-                        return {
-                            'authenticated': True,
-                            'account_id': account_data.get('id'),
-                            'username': account_data.get('username'),
-                            'account_type': account_data.get('account_type')
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Authentication failed: {error_data}")
+            response = await self._request(
+                'GET',
+                self._account_url,
+                params={
+                    'fields': 'id,username,account_type',
+                    'access_token': self.access_token
+                }
+            )
+            if response.status_code == 200:
+                account_data = orjson.loads(response.content)
+                self.authenticated = True
+                result = {
+                    'authenticated': True,
+                    'account_id': account_data.get('id'),
+                    'username': account_data.get('username'),
+                    'account_type': account_data.get('account_type')
+                }
+                self._store_auth_cache(self._account_url, result)
+                return result
+            else:
+                raise PostError(f"Authentication failed: {error_body(response)}")
         
-        except Exception as e:
+        except httpx.HTTPError as e:
+            self.authenticated = False
+            raise PostError(f"Instagram authentication error: {e}") from e
+        except Exception:
             self.authenticated = False
-            raise Exception(f"Instagram authentication error: {str(e)}")
+            raise
     
     async def create_post(
         self,
@@ -83,14 +116,16 @@ class InstagramPoster(BasePoster):
         - schedule_time: Not directly supported, but can be implemented with containers
         """
         try:
-            if not self.authenticated:
-                await self.authenticate()
+            await self.ensure_authenticated()
             
-            if not media_urls or len(media_urls) == 0:
-                raise Exception("Instagram requires at least one media URL")
+            if not media_urls:
+                raise PostError("Instagram requires at least one media URL")
             
-            # Step 1: Create media container
-            container_id = await self._create_media_container(text, media_urls[0])
+            # Step 1: Create media container (carousel for multiple items)
+            if len(media_urls) > 1:
+                container_id = await self._create_carousel_container(text, media_urls)
+            else:
+                container_id = await self._create_media_container(text, media_urls[0])
             
             # Step 2: Publish the container
             post_id = await self._publish_media_container(container_id)
@@ -101,92 +136,99 @@ class InstagramPoster(BasePoster):
                 'platform': 'instagram'
             }
         
-        except Exception as e:
-            raise Exception(f"Instagram post error: {str(e)}")
+        except httpx.HTTPError as e:
+            raise PostError(f"Instagram post error: {e}") from e
     
-    async def _create_media_container(self, caption: str, media_url: str) -> str:
-        """Create Instagram media container"""
-        try:
-            # Determine if it's a video or image
-            is_video = media_url.lower().endswith(('.mp4', '.mov', '.avi'))
-            
-            data = {
-                'caption': caption,
-                'access_token': self.access_token
-            }
-            
-            if is_video:
-                data['media_type'] = 'VIDEO'
-                data['video_url'] = media_url
-            else:
-                data['image_url'] = media_url
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.graph_api_url}/{self.instagram_account_id}/media",
-                    data=data
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        return result.get('id')
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Container creation failed: {error_data}")
+    async def _create_media_container(
+        self,
+        caption: str,
+        media_url: str,
+        media_type: str = 'IMAGE'
+    ) -> str:
+        """Create Instagram media container (IMAGE, VIDEO, REELS or STORIES)"""
+        data = {'caption': caption} if caption else {}
+        self._add_media(data, media_url, media_type)
+        return await self._create_container(data)
+    
+    async def _create_child_container(self, media_url: str) -> str:
+        """Create a carousel item container"""
+        data = {
+            'is_carousel_item': 'true'
+        }
+        self._add_media(data, media_url)
+        return await self._create_container(data)
+    
+    async def _create_carousel_container(self, caption: str, media_urls: List[str]) -> str:
+        """Create a carousel container; child containers are created concurrently"""
+        children = await asyncio.gather(
+            *(self._create_child_container(url) for url in media_urls[:MAX_CAROUSEL_ITEMS])
+        )
+        return await self._create_container({
+            'media_type': 'CAROUSEL',
+            'caption': caption,
+            'children': ','.join(children)
+        })
+    
+    def _add_media(self, data: Dict, media_url: str, media_type: str = 'IMAGE') -> None:
+        """Add an image or video URL (and its media type) to container data"""
+        # Determine if it's a video or image
+        is_video = media_type in ('VIDEO', 'REELS') or self.is_video_url(media_url)
+        if is_video and media_type == 'IMAGE':
+            media_type = 'VIDEO'
         
-        except Exception as e:
-            raise Exception(f"Container creation error: {str(e)}")
+        # Images are the API default and carry no media_type
+        if media_type != 'IMAGE':
+            data['media_type'] = media_type
+        if is_video:
+            data['video_url'] = media_url
+        else:
+            data['image_url'] = media_url
+    
+    async def _create_container(self, data: Dict) -> str:
+        """POST container data and return the container ID"""
+        response = await self._request(
+            'POST',
+            self._media_url,
+            content=self._form_body(data),
+            headers=FORM_HEADERS
+        )
+        if response.status_code in [200, 201]:
+            result = orjson.loads(response.content)
+            return result.get('id')
+        else:
+            raise PostError(f"Container creation failed: {error_body(response)}")
     
     async def _publish_media_container(self, container_id: str) -> str:
         """Publish Instagram media container"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.graph_api_url}/{self.instagram_account_id}/media_publish",
-                    data={
-                        'creation_id': container_id,
-                        'access_token': self.access_token
-                    }
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        return result.get('id')
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Publishing failed: {error_data}")
-        
-        except Exception as e:
-            raise Exception(f"Publishing error: {str(e)}")
+        response = await self._request(
+            'POST',
+            self._media_publish_url,
+            content=self._form_body({
+                'creation_id': container_id
+            }),
+            headers=FORM_HEADERS
+        )
+        if response.status_code in [200, 201]:
+            result = orjson.loads(response.content)
+            return result.get('id')
+        else:
+            raise PostError(f"Publishing failed: {error_body(response)}")
     
     async def create_story(self, media_url: str) -> Dict:
         """Create an Instagram Story"""
         try:
-            if not self.authenticated:
-                await self.authenticate()
+            await self.ensure_authenticated()
             
             # Create story container
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.graph_api_url}/{self.instagram_account_id}/media",
-                    data={
-                        'image_url': media_url,
-                        'media_type': 'STORIES',
-                        'access_token': self.access_token
-                    }
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        container_id = result.get('id')
-                        
-                        # Publish story
-                        story_id = await self._publish_media_container(container_id)
-                        return {
-                            'story_id': story_id,
-                            'success': True,
-                            'platform': 'instagram'
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Story creation failed: {error_data}")
+            container_id = await self._create_media_container('', media_url, media_type='STORIES')
+            
+            # Publish story; shielded so a cancelled caller doesn't leave the container unpublished
+            story_id = await asyncio.shield(self._publish_media_container(container_id))
+            return {
+                'story_id': story_id,
+                'success': True,
+                'platform': 'instagram'
+            }
         
-        except Exception as e:
-            raise Exception(f"Instagram story error: {str(e)}")
+        except httpx.HTTPError as e:
+            raise PostError(f"Instagram story error: {e}") from e
@@ -0,0 +1,18 @@
+"""
+Event loop setup shared by the API server and the examples
+"""
+
+import asyncio
+
+
+def install_event_loop() -> bool:
+    """Use uvloop for new event loops when it is available"""
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+UVLOOP_INSTALLED = install_event_loop()
@@ -3,18 +3,39 @@ Threads API Poster
 Uses Threads API (built on Instagram infrastructure) for posting
 """
 
-import aiohttp
+import asyncio
+import httpx
+import orjson
 import os
 from typing import Optional, List, Dict
-from .base_poster import BasePoster
+from urllib.parse import urlencode
+from .base_poster import BasePoster, PostError, FORM_HEADERS, error_body
+
+# Environment is fixed for the life of the process, read it once
+THREADS_ACCESS_TOKEN = os.getenv('THREADS_ACCESS_TOKEN')
+THREADS_USER_ID = os.getenv('THREADS_USER_ID')
 
 class ThreadsPoster(BasePoster):
     """Threads posting functionality"""
     
+    __slots__ = (
+        'graph_api_url', 'threads_user_id', '_user_url', '_threads_url',
+        '_threads_publish_url'
+    )
+    
+    warmup_url = "https://graph.threads.net"
+    
     def __init__(self):
         super().__init__('threads')
         self.graph_api_url = "https://graph.threads.net/v1.0"
-        self.threads_user_id = os.getenv('THREADS_USER_ID')
+        self.threads_user_id = THREADS_USER_ID
+        self._set_user_urls()
+    
+    def _set_user_urls(self) -> None:
+        """Build endpoint URLs for the current Threads user"""
+        self._user_url = f"{self.graph_api_url}/{self.threads_user_id}"
+        self._threads_url = f"{self._user_url}/threads"
+        self._threads_publish_url = f"{self._user_url}/threads_publish"
     
     async def authenticate(
         self,
@@ -28,40 +49,49 @@ class ThreadsPoster(BasePoster):
         Requires: access_token and threads_user_id
         """
         try:
-            self.access_token = access_token or os.getenv('THREADS_ACCESS_TOKEN')
+            self.access_token = access_token or THREADS_ACCESS_TOKEN
             
             if additional_params and 'threads_user_id' in additional_params:
                 self.threads_user_id = additional_params['threads_user_id']
-            else:
-                self.threads_user_id = self.threads_user_id or os.getenv('THREADS_USER_ID')
+            self._set_user_urls()
             
             if not self.access_token or not self.threads_user_id:
-                raise Exception("Threads access token and user ID are required")
+                raise PostError("Threads access token and user ID are required")
+            self._token_kv = urlencode({'access_token': self.access_token})
+            
+            # Reuse a recent verification from another worker, if any
+            cached = self._load_auth_cache(self._user_url)
+            if cached is not None:
+                return cached
             
             # Verify credentials
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.graph_api_url}/{self.threads_user_id}",
-                    params={
-                        'fields': 'id,username,threads_profile_picture_url',
-                        'access_token': self.access_token
-                    }
-                ) as response:
-                    if response.status == 200:
-                        user_data = await response.json()
-                        self.authenticated = True
-                        return {
-                            'authenticated': True,
-                            'user_id': user_data.get('id'),
-                            'username': user_data.get('username')
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Authentication failed: {error_data}")
+            response = await self._request(
+                'GET',
+                self._user_url,
+                params={
+                    'fields': 'id,username,threads_profile_picture_url',
+                    'access_token': self.access_token
+                }
+            )
+            if response.status_code == 200:
+                user_data = orjson.loads(response.content)
+                self.authenticated = True
+                result = {
+                    'authenticated': True,
+                    'user_id': user_data.get('id'),
+                    'username': user_data.get('username')
+                }
+                self._store_auth_cache(self._user_url, result)
+                return result
+            else:
+                raise PostError(f"Authentication failed: {error_body(response)}")
         
-        except Exception as e:
+        except httpx.HTTPError as e:
+            self.authenticated = False
+            raise PostError(f"Threads authentication error: {e}") from e
+        except Exception:
             self.authenticated = False
-            raise Exception(f"Threads authentication error: {str(e)}")
+            raise
     
     async def create_post(
         self,
@@ -82,8 +112,7 @@ class ThreadsPoster(BasePoster):
         - schedule_time: Not currently supported
         """
         try:
-            if not self.authenticated:
-                await self.authenticate()
+            await self.ensure_authenticated()
             
             # Step 1: Create media container
             container_id = await self._create_media_container(text, media_urls)
@@ -97,8 +126,8 @@ class ThreadsPoster(BasePoster):
                 'platform': 'threads'
             }
         
-        except Exception as e:
-            raise Exception(f"Threads post error: {str(e)}")
+        except httpx.HTTPError as e:
+            raise PostError(f"Threads post error: {e}") from e
     
     async def _create_media_container(
         self,
@@ -106,94 +135,80 @@ class ThreadsPoster(BasePoster):
         media_urls: Optional[List[str]] = None
     ) -> str:
         """Create Threads media container"""
-        try:
-            data = {
-                'media_type': 'TEXT',
-                'text': text,
-                'access_token': self.access_token
-            }
+        data = {
+            'media_type': 'TEXT',
+            'text': text
+        }
+        
+        # Add media if provided
+        if media_urls:
+            media_url = media_urls[0]  # Threads supports 1 media item per post
             
-            # Add media if provided
-            if media_urls and len(media_urls) > 0:
-                media_url = media_urls[0]  # Threads supports 1 media item per post
-                
-                # Determine media type
-                is_video = media_url.lower().endswith(('.mp4', '.mov', '.avi'))
-                
-                if is_video:
-                    data['media_type'] = 'VIDEO'
-                    data['video_url'] = media_url
-                else:
-                    data['media_type'] = 'IMAGE'
-                    data['image_url'] = media_url
+            # Determine media type
+            is_video = self.is_video_url(media_url)
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.graph_api_url}/{self.threads_user_id}/threads",
-                    data=data
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        return result.get('id')
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Container creation failed: {error_data}")
+            if is_video:
+                data['media_type'] = 'VIDEO'
+                data['video_url'] = media_url
+            else:
+                data['media_type'] = 'IMAGE'
+                data['image_url'] = media_url
         
-        except Exception as e:
-            raise Exception(f"Container creation error: {str(e)}")
+        return await self._create_container(data)
+    
+    async def _create_reply_container(self, text: str, reply_to_id: str) -> str:
+        """Create Threads reply container"""
+        return await self._create_container({
+            'media_type': 'TEXT',
+            'text': text,
+            'reply_to_id': reply_to_id
+        })
+    
+    async def _create_container(self, data: Dict) -> str:
+        """POST container data and return the container ID"""
+        response = await self._request(
+            'POST',
+            self._threads_url,
+            content=self._form_body(data),
+            headers=FORM_HEADERS
+        )
+        if response.status_code in [200, 201]:
+            result = orjson.loads(response.content)
+            return result.get('id')
+        else:
+            raise PostError(f"Container creation failed: {error_body(response)}")
     
     async def _publish_container(self, container_id: str) -> str:
         """Publish Threads container"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.graph_api_url}/{self.threads_user_id}/threads_publish",
-                    data={
-                        'creation_id': container_id,
-                        'access_token': self.access_token
-                    }
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        return result.get('id')
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Publishing failed: {error_data}")
-        
-        except Exception as e:
-            raise Exception(f"Publishing error: {str(e)}")
+        response = await self._request(
+            'POST',
+            self._threads_publish_url,
+            content=self._form_body({
+                'creation_id': container_id
+            }),
+            headers=FORM_HEADERS
+        )
+        if response.status_code in [200, 201]:
+            result = orjson.loads(response.content)
+            return result.get('id')
+        else:
+            raise PostError(f"Publishing failed: {error_body(response)}")
     
     async def create_reply(self, text: str, reply_to_id: str) -> Dict:
         """Create a reply to a Threads post"""
         try:
-            if not self.authenticated:
-                await self.authenticate()
+            await self.ensure_authenticated()
             
             # Create reply container
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.graph_api_url}/{self.threads_user_id}/threads",
-                    data={
-                        'media_type': 'TEXT',
-                        'text': text,
-                        'reply_to_id': reply_to_id,
-                        'access_token': self.access_token
-                    }
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        container_id = result.get('id')
-                        
-                        # Publish reply
-                        reply_id = await self._publish_container(container_id)
-                        return {
-                            'reply_id': reply_id,
-                            'success': True,
-                            'platform': 'threads'
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Reply creation failed: {error_data}")
+            container_id = await self._create_reply_container(text, reply_to_id)
+            
+            # Publish reply; shielded so a cancelled caller doesn't leave the container unpublished
+            reply_id = await asyncio.shield(self._publish_container(container_id))
+            return {
+                'reply_id': reply_id,
+                'success': True,
+                'platform': 'threads'
+            }
         
-        except Exception as e:
-            raise Exception(f"Threads reply error: {str(e)}")
+        except httpx.HTTPError as e:
+            raise PostError(f"Threads reply error: {e}") from e
@@ -3,19 +3,49 @@ TikTok API Poster
 Uses TikTok Content Posting API for uploading videos
 """
 
-import aiohttp
+import httpx
+import orjson
 import os
-from typing import Optional, List, Dict
-from .base_poster import BasePoster
+from typing import Optional, List, Dict, Tuple
+from .base_poster import BasePoster, PostError, error_body, media_size
+
+# Environment is fixed for the life of the process, read it once
+TIKTOK_ACCESS_TOKEN = os.getenv('TIKTOK_ACCESS_TOKEN')
+TIKTOK_CLIENT_KEY = os.getenv('TIKTOK_CLIENT_KEY')
+TIKTOK_CLIENT_SECRET = os.getenv('TIKTOK_CLIENT_SECRET')
+
+# TikTok accepts 5-64 MB chunks; videos smaller than one chunk go up whole
+CHUNK_SIZE = 10_000_000
+
+# Largest video TikTok accepts
+MAX_VIDEO_BYTES = 4 * 1024 ** 3
+
+def _chunk_plan(video_size: int) -> Tuple[int, int]:
+    """Return (chunk_size, total_chunk_count) for a video of video_size bytes"""
+    if video_size <= CHUNK_SIZE:
+        return video_size, 1
+    return CHUNK_SIZE, video_size // CHUNK_SIZE
 
 class TikTokPoster(BasePoster):
     """TikTok posting functionality"""
     
+    __slots__ = (
+        'api_url', 'client_key', 'client_secret', '_user_info_url',
+        '_upload_init_url', '_publish_url', '_auth_headers', '_json_headers'
+    )
+    
+    warmup_url = "https://open.tiktokapis.com"
+    
     def __init__(self):
         super().__init__('tiktok')
         self.api_url = "https://open.tiktokapis.com/v2"
-        self.client_key = os.getenv('TIKTOK_CLIENT_KEY')
-        self.client_secret = os.getenv('TIKTOK_CLIENT_SECRET')
+        self._user_info_url = f"{self.api_url}/user/info/"
+        self._upload_init_url = f"{self.api_url}/post/publish/inbox/video/init/"
+        self._publish_url = f"{self.api_url}/post/publish/video/init/"
+        self._auth_headers: Dict[str, str] = {}
+        self._json_headers: Dict[str, str] = {}
+        self.client_key = TIKTOK_CLIENT_KEY
+        self.client_secret = TIKTOK_CLIENT_SECRET
     
     async def authenticate(
         self,
@@ -29,41 +59,51 @@ class TikTokPoster(BasePoster):
         Uses OAuth 2.0 flow
         """
         try:
-            self.access_token = access_token or os.getenv('TIKTOK_ACCESS_TOKEN')
+            self.access_token = access_token or TIKTOK_ACCESS_TOKEN
             self.client_key = api_key or self.client_key
             self.client_secret = api_secret or self.client_secret
             
             if not self.access_token:
-                raise Exception("TikTok access token is required")
+                raise PostError("TikTok access token is required")
+            
+            # Built once per token and reused by every request
+            self._auth_headers = {'Authorization': f'Bearer {self.access_token}'}
+            self._json_headers = {**self._auth_headers, 'Content-Type': 'application/json'}
+            
+            # Reuse a recent verification from another worker, if any
+            cached = self._load_auth_cache(self._user_info_url)
+            if cached is not None:
+                return cached
             
             # Verify token by getting user info
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.api_url}/user/info/",
-                    headers={
-                        'Authorization': f'Bearer {self.access_token}',
-                        'Content-Type': 'application/json'
-                    },
-                    params={
-                        'fields': 'open_id,union_id,avatar_url,display_name'
-                    }
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        user_data = result.get('data', {}).get('user', {})
-                        self.authenticated = True
-                        return {
-                            'authenticated': True,
-                            'open_id': user_data.get('open_id'),
-                            'display_name': user_data.get('display_name')
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Authentication failed: {error_data}")
+            response = await self._request(
+                'GET',
+                self._user_info_url,
+                headers=self._auth_headers,
+                params={
+                    'fields': 'open_id,union_id,avatar_url,display_name'
+                }
+            )
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                user_data = result.get('data', {}).get('user', {})
+                self.authenticated = True
+                verification = {
+                    'authenticated': True,
+                    'open_id': user_data.get('open_id'),
+                    'display_name': user_data.get('display_name')
+                }
+                self._store_auth_cache(self._user_info_url, verification)
+                return verification
+            else:
+                raise PostError(f"Authentication failed: {error_body(response)}")
         
-        except Exception as e:
+        except httpx.HTTPError as e:
             self.authenticated = False
-            raise Exception(f"TikTok authentication error: {str(e)}")
+            raise PostError(f"TikTok authentication error: {e}") from e
+        except Exception:
+            self.authenticated = False
+            raise
     
     async def create_post(
         self,
@@ -75,7 +115,7 @@ class TikTokPoster(BasePoster):
         Create a video post on TikTok
         
         TikTok requires:
-        1. Initialize upload
+        1. Initialize upload (video size and chunk layout)
         2. Upload video chunks
         3. Publish video
         
@@ -85,23 +125,19 @@ class TikTokPoster(BasePoster):
         - schedule_time: Scheduled publish time (Unix timestamp)
         """
         try:
-            if not self.authenticated:
-                await self.authenticate()
+            await self.ensure_authenticated()
             
-            if not media_urls or len(media_urls) == 0:
-                raise Exception("TikTok requires a video URL")
+            if not media_urls:
+                raise PostError("TikTok requires a video URL")
             
             video_url = media_urls[0]
             
-            # Step 1: Initialize video upload
-            upload_data = await self._initialize_upload()
-            
-            # Step 2: Upload video
-            await self._upload_video(upload_data['upload_url'], video_url)
+            # Steps 1-2: Initialize upload and stream video chunks
+            publish_id = await self._upload_video(video_url)
             
             # Step 3: Publish video
             post_id = await self._publish_video(
-                upload_data['publish_id'],
+                publish_id,
                 text,
                 schedule_time
             )
@@ -112,64 +148,80 @@ class TikTokPoster(BasePoster):
                 'platform': 'tiktok'
             }
         
-        except Exception as e:
-            raise Exception(f"TikTok post error: {str(e)}")
+        except httpx.HTTPError as e:
+            raise PostError(f"TikTok post error: {e}") from e
     
-    async def _initialize_upload(self) -> Dict:
+    async def _initialize_upload(self, video_size: int) -> Dict:
         """Initialize TikTok video upload"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_url}/post/publish/inbox/video/init/",
-                    headers={
-                        'Authorization': f'Bearer {self.access_token}',
-                        'Content-Type': 'application/json'
-                    },
-                    json={
-                        'source_info': {
-                            'source': 'FILE_UPLOAD',
-                            'video_size': 0,  # Will be determined during upload
-                            'chunk_size': 10000000,  # 10MB chunks
-                            'total_chunk_count': 1
-                        }
-                    }
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        data = result.get('data', {})
-                        return {
-                            'upload_url': data.get('upload_url'),
-                            'publish_id': data.get('publish_id')
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Upload initialization failed: {error_data}")
+        chunk_size, total_chunk_count = _chunk_plan(video_size)
         
-        except Exception as e:
-            raise Exception(f"Upload initialization error: {str(e)}")
+        response = await self._request(
+            'POST',
+            self._upload_init_url,
+            headers=self._json_headers,
+            content=orjson.dumps({
+                'source_info': {
+                    'source': 'FILE_UPLOAD',
+                    'video_size': video_size,
+                    'chunk_size': chunk_size,
+                    'total_chunk_count': total_chunk_count
+                }
+            })
+        )
+        if response.status_code in [200, 201]:
+            result = orjson.loads(response.content)
+            data = result.get('data', {})
+            return {
+                'upload_url': data.get('upload_url'),
+                'publish_id': data.get('publish_id'),
+                'chunk_size': chunk_size,
+                'total_chunk_count': total_chunk_count
+            }
+        else:
+            raise PostError(f"Upload initialization failed: {error_body(response)}")
     
-    async def _upload_video(self, upload_url: str, video_url: str) -> bool:
-        """Upload video to TikTok"""
-        try:
-            # Download video from URL and upload to TikTok
-            async with aiohttp.ClientSession() as session:
-                # Download video
-                async with session.get(video_url) as video_response:
-                    if video_response.status == 200:
-                        video_data = await video_response.read()
-                        
-                        # Upload to TikTok
-                        async with session.put(
-                            upload_url,
-                            data=video_data,
-                            headers={'Content-Type': 'video/mp4'}
-                        ) as upload_response:
-                            return upload_response.status in [200, 201, 204]
-                    else:
-                        raise Exception("Failed to download video")
+    async def _upload_video(self, video_url: str) -> str:
+        """
+        Stream a video from its URL to TikTok and return the publish ID
         
-        except Exception as e:
-            raise Exception(f"Video upload error: {str(e)}")
+        The download is forwarded chunk by chunk, so at most one chunk is
+        held in memory instead of the whole video.
+        """
+        async with self._download(video_url) as video_response:
+            if video_response.status_code != 200:
+                raise PostError("Failed to download video")
+            
+            video_size = media_size(video_response, MAX_VIDEO_BYTES)
+            
+            upload_data = await self._initialize_upload(video_size)
+            chunk_size = upload_data['chunk_size']
+            total_chunk_count = upload_data['total_chunk_count']
+            chunks = video_response.aiter_bytes(chunk_size)
+            
+            start = 0
+            for index in range(total_chunk_count):
+                # The last chunk carries the remainder of the video
+                if index == total_chunk_count - 1:
+                    chunk = b''.join([part async for part in chunks])
+                else:
+                    chunk = await chunks.__anext__()
+                end = start + len(chunk)
+                
+                upload_response = await self._request(
+                    'PUT',
+                    upload_data['upload_url'],
+                    content=chunk,
+                    headers={
+                        'Content-Type': 'video/mp4',
+                        'Content-Range': f'bytes {start}-{end - 1}/{video_size}'
+                    }
+                )
+                if upload_response.status_code not in [200, 201, 206]:
+                    raise PostError(f"Chunk {index + 1}/{total_chunk_count} upload failed")
+                
+                start = end
+            
+            return upload_data['publish_id']
     
     async def _publish_video(
         self,
@@ -178,42 +230,34 @@ class TikTokPoster(BasePoster):
         schedule_time: Optional[str] = None
     ) -> str:
         """Publish video to TikTok"""
-        try:
-            post_data = {
-                'post_info': {
-                    'title': caption,
-                    'privacy_level': 'PUBLIC_TO_EVERYONE',
-                    'disable_duet': False,
-                    'disable_comment': False,
-                    'disable_stitch': False,
-                    'video_cover_timestamp_ms': 1000
-                },
-                'source_info': {
-                    'source': 'FILE_UPLOAD',
-                    'publish_id': publish_id
-                }
+        post_data = {
+            'post_info': {
+                'title': caption,
+                'privacy_level': 'PUBLIC_TO_EVERYONE',
+                'disable_duet': False,
+                'disable_comment': False,
+                'disable_stitch': False,
+                'video_cover_timestamp_ms': 1000
+            },
+            'source_info': {
+                'source': 'FILE_UPLOAD',
+                'publish_id': publish_id
             }
-            
-            # Add scheduling if provided
-            if schedule_time:
-                post_data['post_info']['post_mode'] = 'SCHEDULED'
-                post_data['post_info']['schedule_time'] = int(schedule_time)
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_url}/post/publish/video/init/",
-                    headers={
-                        'Authorization': f'Bearer {self.access_token}',
-                        'Content-Type': 'application/json'
-                    },
-                    json=post_data
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        return result.get('data', {}).get('publish_id')
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Video publishing failed: {error_data}")
+        }
+        
+        # Add scheduling if provided
+        if schedule_time:
+            post_data['post_info']['post_mode'] = 'SCHEDULED'
+            post_data['post_info']['schedule_time'] = int(schedule_time)
         
-        except Exception as e:
-            raise Exception(f"Video publishing error: {str(e)}")
+        response = await self._request(
+            'POST',
+            self._publish_url,
+            headers=self._json_headers,
+            content=orjson.dumps(post_data)
+        )
+        if response.status_code in [200, 201]:
+            result = orjson.loads(response.content)
+            return result.get('data', {}).get('publish_id')
+        else:
+            raise PostError(f"Video publishing failed: {error_body(response)}")
@@ -3,25 +3,46 @@ X (Twitter) API Poster
 Uses X API v2 for posting tweets
 """
 
-import aiohttp
+import asyncio
+import httpx
 import os
 from typing import Optional, List, Dict
-from .base_poster import BasePoster
-import base64
-import hmac
-import hashlib
-import time
-import secrets
+from authlib.integrations.httpx_client import OAuth1Auth
+from .base_poster import BasePoster, PostError, error_body, media_size, read_media
+import orjson
+
+# Environment is fixed for the life of the process, read it once
+X_API_KEY = os.getenv('X_API_KEY')
+X_API_SECRET = os.getenv('X_API_SECRET')
+X_ACCESS_TOKEN = os.getenv('X_ACCESS_TOKEN')
+X_ACCESS_TOKEN_SECRET = os.getenv('X_ACCESS_TOKEN_SECRET')
+X_BEARER_TOKEN = os.getenv('X_BEARER_TOKEN')
+
+# APPEND accepts at most 5 MB per segment
+MEDIA_SEGMENT_SIZE = 4 * 1024 * 1024
+
+# Largest still image and video X accepts
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+MAX_VIDEO_BYTES = 512 * 1024 * 1024
 
 class XPoster(BasePoster):
     """X (Twitter) posting functionality"""
     
+    warmup_url = "https://api.twitter.com"
+    
     def __init__(self):
         super().__init__('x')
         self.api_url = "https://api.twitter.com/2"
-        self.api_key = os.getenv('X_API_KEY')
-        self.api_secret = os.getenv('X_API_SECRET')
-        self.bearer_token = os.getenv('X_BEARER_TOKEN')
+        self._users_me_url = f"{self.api_url}/users/me"
+        self._tweets_url = f"{self.api_url}/tweets"
+        self.api_key = X_API_KEY
+        self.api_secret = X_API_SECRET
+        self.bearer_token = X_BEARER_TOKEN
+        self._auth_headers: Dict[str, str] = {}
+        self._json_headers: Dict[str, str] = {'Content-Type': 'application/json'}
+        
+        # Signs each request (OAuth 1.0a) when no bearer token is configured
+        self._oauth: Optional[OAuth1Auth] = None
     
     async def authenticate(
         self,
@@ -35,42 +56,55 @@ class XPoster(BasePoster):
         Uses OAuth 2.0 Bearer Token or OAuth 1.0a
         """
         try:
-            self.access_token = access_token or os.getenv('X_ACCESS_TOKEN')
-            self.access_token_secret = os.getenv('X_ACCESS_TOKEN_SECRET')
+            self.access_token = access_token or X_ACCESS_TOKEN
+            self.access_token_secret = X_ACCESS_TOKEN_SECRET
             self.api_key = api_key or self.api_key
             self.api_secret = api_secret or self.api_secret
-            self.bearer_token = self.bearer_token or os.getenv('X_BEARER_TOKEN')
             
             if not self.bearer_token and not (self.access_token and self.access_token_secret):
-                raise Exception("X API requires bearer token or access tokens")
+                raise PostError("X API requires bearer token or access tokens")
+            
+            self._oauth = None if self.bearer_token else OAuth1Auth(
+                client_id=self.api_key,
+                client_secret=self.api_secret,
+                token=self.access_token,
+                token_secret=self.access_token_secret,
+                # Otherwise authlib drops JSON and multipart bodies from the request
+                force_include_body=True
+            )
+            
+            # Built once per token and reused by every request
+            self._auth_headers = (
+                {'Authorization': f'Bearer {self.bearer_token}'} if self.bearer_token else {}
+            )
+            self._json_headers = {**self._auth_headers, 'Content-Type': 'application/json'}
             
             # Verify credentials by getting user info
-            async with aiohttp.ClientSession() as session:
-                headers = {}
-                if self.bearer_token:
-                    headers['Authorization'] = f'Bearer {self.bearer_token}'
-                
-                async with session.get(
-                    f"{self.api_url}/users/me",
-                    headers=headers
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        user_data = result.get('data', {})
-                        self.authenticated = True
-                        return {
-                            'authenticated': True,
-                            'user_id': user_data.get('id'),
-                            'username': user_data.get('username'),
-                            'name': user_data.get('name')
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Authentication failed: {error_data}")
+            response = await self._request(
+                'GET',
+                self._users_me_url,
+                headers=self._auth_headers,
+                auth=self._oauth
+            )
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                user_data = result.get('data', {})
+                self.authenticated = True
+                return {
+                    'authenticated': True,
+                    'user_id': user_data.get('id'),
+                    'username': user_data.get('username'),
+                    'name': user_data.get('name')
+                }
+            else:
+                raise PostError(f"Authentication failed: {error_body(response)}")
         
-        except Exception as e:
+        except httpx.HTTPError as e:
             self.authenticated = False
-            raise Exception(f"X authentication error: {str(e)}")
+            raise PostError(f"X authentication error: {e}") from e
+        except Exception:
+            self.authenticated = False
+            raise
     
     async def create_post(
         self,
@@ -87,8 +121,8 @@ class XPoster(BasePoster):
         - schedule_time: Not directly supported in API v2
         """
         try:
-            if not self.authenticated:
-                await self.authenticate()
+            # Authenticate while any media downloads start
+            self.prefetch_authentication()
             
             # Prepare tweet data
             tweet_data = {
@@ -96,134 +130,110 @@ class XPoster(BasePoster):
             }
             
             # Upload media if provided
-            if media_urls and len(media_urls) > 0:
-                media_ids = []
-                for media_url in media_urls[:4]:  # Max 4 media items
-                    media_id = await self._upload_media(media_url)
-                    media_ids.append(media_id)
+            if media_urls:
+                # Max 4 media items, uploaded concurrently; gather keeps their order
+                results = await asyncio.gather(
+                    *(self._upload_media(media_url) for media_url in media_urls[:4]),
+                    return_exceptions=True
+                )
+                errors = [str(r) for r in results if isinstance(r, BaseException)]
+                if errors:
+                    raise PostError(f"{len(errors)} media upload(s) failed: {'; '.join(errors)}")
+                media_ids = list(results)
                 
                 if media_ids:
                     tweet_data['media'] = {'media_ids': media_ids}
             
             # Post tweet
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    'Content-Type': 'application/json'
+            await self.ensure_authenticated()
+            response = await self._request(
+                'POST',
+                self._tweets_url,
+                headers=self._json_headers,
+                auth=self._oauth,
+                content=orjson.dumps(tweet_data)
+            )
+            if response.status_code in [200, 201]:
+                result = orjson.loads(response.content)
+                return {
+                    'post_id': result.get('data', {}).get('id'),
+                    'success': True,
+                    'platform': 'x'
                 }
-                
-                if self.bearer_token:
-                    headers['Authorization'] = f'Bearer {self.bearer_token}'
-                elif self.access_token:
-                    # Use OAuth 1.0a
-                    headers['Authorization'] = self._get_oauth_header('POST', f"{self.api_url}/tweets")
-                
-                async with session.post(
-                    f"{self.api_url}/tweets",
-                    headers=headers,
-                    json=tweet_data
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        return {
-                            'post_id': result.get('data', {}).get('id'),
-                            'success': True,
-                            'platform': 'x'
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Tweet posting failed: {error_data}")
+            else:
+                raise PostError(f"Tweet posting failed: {error_body(response)}")
         
-        except Exception as e:
-            raise Exception(f"X post error: {str(e)}")
+        except httpx.HTTPError as e:
+            raise PostError(f"X post error: {e}") from e
     
     async def _upload_media(self, media_url: str) -> str:
-        """Upload media to X and return media_id"""
-        try:
-            # Download media
-            async with aiohttp.ClientSession() as session:
-                async with session.get(media_url) as media_response:
-                    if media_response.status != 200:
-                        raise Exception("Failed to download media")
-                    
-                    media_data = await media_response.read()
-                    
-                    # Determine media type
-                    content_type = media_response.headers.get('Content-Type', 'image/jpeg')
-                    
-                    # Upload to X (using v1.1 media upload endpoint)
-                    upload_url = "https://upload.twitter.com/1.1/media/upload.json"
-                    
-                    # INIT
-                    init_data = {
-                        'command': 'INIT',
-                        'total_bytes': len(media_data),
-                        'media_type': content_type
-                    }
-                    
-                    headers = {}
-                    if self.bearer_token:
-                        headers['Authorization'] = f'Bearer {self.bearer_token}'
-                    
-                    async with session.post(
-                        upload_url,
-                        headers=headers,
-                        data=init_data
-                    ) as init_response:
-                        if init_response.status in [200, 201, 202]:
-                            init_result = await init_response.json()
-                            media_id = init_result.get('media_id_string')
-                            
-                            # APPEND
-                            append_data = {
-                                'command': 'APPEND',
-                                'media_id': media_id,
-                                'segment_index': 0,
-                                'media': media_data
-                            }
-                            
-                            async with session.post(
-                                upload_url,
-                                headers=headers,
-                                data=append_data
-                            ) as append_response:
-                                if append_response.status in [200, 201, 204]:
-                                    # FINALIZE
-                                    finalize_data = {
-                                        'command': 'FINALIZE',
-                                        'media_id': media_id
-                                    }
-                                    
-                                    async with session.post(
-                                        upload_url,
-                                        headers=headers,
-                                        data=finalize_data
-                                    ) as finalize_response:
-                                        if finalize_response.status in [200, 201]:
-                                            return media_id
-                                        else:
-                                            raise Exception("Media finalization failed")
-                                else:
-                                    raise Exception("Media append failed")
-                        else:
-                            error_data = await init_response.json()
-                            raise Exception(f"Media init failed: {error_data}")
-        
-        except Exception as e:
-            raise Exception(f"Media upload error: {str(e)}")
-    
-    def _get_oauth_header(self, method: str, url: str) -> str:
-        """Generate OAuth 1.0a authorization header"""
-        # This is a simplified version. For production, use a proper OAuth library
-        oauth_params = {
-            'oauth_consumer_key': self.api_key,
-            'oauth_token': self.access_token,
-            'oauth_signature_method': 'HMAC-SHA1',
-            'oauth_timestamp': str(int(time.time())),
-            'oauth_nonce': secrets.token_hex(16),
-            'oauth_version': '1.0'
-        }
+        """
+        Upload media to X and return media_id
         
-        # Generate signature (simplified)
-        # In production, use tweepy or python-twitter library
+        Still images (5 MB max) go up in a single request. Videos and GIFs use
+        INIT/APPEND/FINALIZE, with the download forwarded one APPEND segment
+        at a time so the whole file is never held in memory.
+        """
+        # Download media
+        async with self._download(media_url) as media_response:
+            if media_response.status_code != 200:
+                raise PostError("Failed to download media")
+            
+            # Determine media type
+            content_type = media_response.headers.get('Content-Type', 'image/jpeg')
+            
+            # Still images: one simple upload instead of three round trips. They
+            # are read whole, so they need no Content-Length, only a size cap
+            if content_type.startswith('image/') and content_type != 'image/gif':
+                media_data = await read_media(media_response, MAX_IMAGE_BYTES)
+                result = await self._media_command(
+                    files={'media': ('media', media_data, content_type)}
+                )
+                return result.get('media_id_string')
+            
+            # INIT
+            total_bytes = media_size(media_response, MAX_VIDEO_BYTES)
+            init_result = await self._media_command(data={
+                'command': 'INIT',
+                'total_bytes': total_bytes,
+                'media_type': content_type
+            })
+            media_id = init_result.get('media_id_string')
+            
+            # APPEND; FINALIZE is only accepted once every segment is stored.
+            # Resending a segment index replaces it, so APPENDs are safe to retry
+            segment_index = 0
+            async for segment in media_response.aiter_bytes(MEDIA_SEGMENT_SIZE):
+                await self._media_command(
+                    data={
+                        'command': 'APPEND',
+                        'media_id': media_id,
+                        'segment_index': segment_index
+                    },
+                    files={'media': ('media', segment, content_type)},
+                    idempotent=True
+                )
+                segment_index += 1
         
-        return f'OAuth {", ".join([f"{k}="{v}"" for k, v in oauth_params.items()])}'
+        # FINALIZE
+        await self._media_command(data={
+            'command': 'FINALIZE',
+            'media_id': media_id
+        })
+        return media_id
+    
+    async def _media_command(self, **kwargs) -> Dict:
+        """POST to the v1.1 media upload endpoint and return its JSON result"""
+        await self.ensure_authenticated()
+        response = await self._request(
+            'POST',
+            "https://upload.twitter.com/1.1/media/upload.json",
+            headers=self._auth_headers,
+            auth=self._oauth,
+            **kwargs
+        )
+        if response.status_code == 204:
+            return {}
+        if response.status_code in [200, 201, 202]:
+            return orjson.loads(response.content)
+        raise PostError(f"Media upload request failed: {error_body(response)}")
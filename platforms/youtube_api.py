@@ -3,20 +3,50 @@ YouTube API Poster
 Uses YouTube Data API v3 for uploading videos
 """
 
-import aiohttp
+import asyncio
+import httpx
 import os
-from typing import Optional, List, Dict
-from .base_poster import BasePoster
-import json
+from typing import AsyncIterator, Optional, List, Dict, Tuple
+from .base_poster import BasePoster, PostError, error_body, declared_size, backoff_delay, MAX_RETRIES, RETRY_STATUSES, STREAM_CHUNK_SIZE
+import orjson
+
+# Environment is fixed for the life of the process, read it once
+YOUTUBE_ACCESS_TOKEN = os.getenv('YOUTUBE_ACCESS_TOKEN')
+YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
+
+# Resumable upload chunks must be multiples of 256 KiB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Largest video YouTube accepts
+MAX_VIDEO_BYTES = 256 * 1024 ** 3
+
+# Only the channel properties authenticate reports
+CHANNEL_FIELDS = 'items(id,snippet/title,statistics/subscriberCount)'
+
+# Writable snippet properties; a snippet PUT clears any that are left out
+SNIPPET_FIELDS = 'items/snippet(title,description,tags,categoryId,defaultLanguage)'
+
+def _committed_offset(response: httpx.Response) -> int:
+    """Bytes the server has stored, from the Range header of a 308 response"""
+    committed = response.headers.get('Range')  # e.g. "bytes=0-8388607"
+    return int(committed.rsplit('-', 1)[1]) + 1 if committed else 0
 
 class YouTubePoster(BasePoster):
     """YouTube posting functionality"""
     
+    warmup_url = "https://www.googleapis.com"
+    
     def __init__(self):
         super().__init__('youtube')
         self.api_url = "https://www.googleapis.com/youtube/v3"
         self.upload_url = "https://www.googleapis.com/upload/youtube/v3"
-        self.api_key = os.getenv('YOUTUBE_API_KEY')
+        self._channels_url = f"{self.api_url}/channels"
+        self._videos_url = f"{self.api_url}/videos"
+        self._video_upload_url = f"{self.upload_url}/videos"
+        self.api_key = YOUTUBE_API_KEY
+        self._auth_headers: Dict[str, str] = {}
+        self._json_headers: Dict[str, str] = {}
+        self._upload_init_headers: Dict[str, str] = {}
     
     async def authenticate(
         self,
@@ -30,45 +60,51 @@ class YouTubePoster(BasePoster):
         Uses OAuth 2.0 access token
         """
         try:
-            self.access_token = access_token or os.getenv('YOUTUBE_ACCESS_TOKEN')
+            self.access_token = access_token or YOUTUBE_ACCESS_TOKEN
             self.api_key = api_key or self.api_key
             
             if not self.access_token:
-                raise Exception("YouTube access token is required")
+                raise PostError("YouTube access token is required")
+            
+            # Built once per token and reused by every request
+            self._auth_headers = {'Authorization': f'Bearer {self.access_token}'}
+            self._json_headers = {**self._auth_headers, 'Content-Type': 'application/json'}
+            self._upload_init_headers = {**self._json_headers, 'X-Upload-Content-Type': 'video/*'}
             
             # Verify token by getting channel info
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.api_url}/channels",
-                    params={
-                        'part': 'snippet,contentDetails,statistics',
-                        'mine': 'true'
-                    },
-                    headers={
-                        'Authorization': f'Bearer {self.access_token}'
+            response = await self._request(
+                'GET',
+                self._channels_url,
+                params={
+                    'part': 'snippet,statistics',
+                    'mine': 'true',
+                    'fields': CHANNEL_FIELDS
+                },
+                headers=self._auth_headers
+            )
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                if result.get('items'):
+                    channel = result['items'][0]
+                    self.channel_id = channel.get('id')
+                    self.authenticated = True
+                    return {
+                        'authenticated': True,
+                        'channel_id': channel.get('id'),
+                        'channel_title': channel.get('snippet', {}).get('title'),
+                        'subscriber_count': channel.get('statistics', {}).get('subscriberCount')
                     }
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if result.get('items'):
-                            channel = result['items'][0]
-                            self.channel_id = channel.get('id')
-                            self.authenticated = True
-                            return {
-                                'authenticated': True,
-                                'channel_id': channel.get('id'),
-                                'channel_title': channel.get('snippet', {}).get('title'),
-                                'subscriber_count': channel.get('statistics', {}).get('subscriberCount')
-                            }
-                        else:
-                            raise Exception("No YouTube channel found")
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Authentication failed: {error_data}")
+                else:
+                    raise PostError("No YouTube channel found")
+            else:
+                raise PostError(f"Authentication failed: {error_body(response)}")
         
-        except Exception as e:
+        except httpx.HTTPError as e:
             self.authenticated = False
-            raise Exception(f"YouTube authentication error: {str(e)}")
+            raise PostError(f"YouTube authentication error: {e}") from e
+        except Exception:
+            self.authenticated = False
+            raise
     
     async def create_post(
         self,
@@ -85,18 +121,18 @@ class YouTubePoster(BasePoster):
         - schedule_time: Scheduled publish time (ISO 8601 format)
         """
         try:
-            if not self.authenticated:
-                await self.authenticate()
+            # Authenticate while the video download starts
+            self.prefetch_authentication()
             
-            if not media_urls or len(media_urls) == 0:
-                raise Exception("YouTube requires a video URL")
+            if not media_urls:
+                raise PostError("YouTube requires a video URL")
             
             video_url = media_urls[0]
             
             # Extract title from text (first line) and description (rest)
-            lines = text.split('\n', 1)
-            title = lines[0][:100]  # YouTube title max 100 chars
-            description = lines[1] if len(lines) > 1 else text
+            nl = text.find('\n')
+            title = text[:nl if 0 <= nl < 100 else 100]  # YouTube title max 100 chars
+            description = text[nl + 1:] if nl >= 0 else text
             
             # Upload video
             video_id = await self._upload_video(
@@ -113,8 +149,8 @@ class YouTubePoster(BasePoster):
                 'video_url': f'https://www.youtube.com/watch?v={video_id}'
             }
         
-        except Exception as e:
-            raise Exception(f"YouTube post error: {str(e)}")
+        except httpx.HTTPError as e:
+            raise PostError(f"YouTube post error: {e}") from e
     
     async def _upload_video(
         self,
@@ -125,158 +161,233 @@ class YouTubePoster(BasePoster):
         category_id: str = "22",  # People & Blogs
         privacy_status: str = "public"
     ) -> str:
-        """Upload video to YouTube"""
-        try:
-            # Download video
-            async with aiohttp.ClientSession() as session:
-                async with session.get(video_url) as video_response:
-                    if video_response.status != 200:
-                        raise Exception("Failed to download video")
-                    
-                    video_data = await video_response.read()
-                    
-                    # Prepare metadata
-                    metadata = {
-                        'snippet': {
-                            'title': title,
-                            'description': description,
-                            'categoryId': category_id,
-                            'tags': []
-                        },
-                        'status': {
-                            'privacyStatus': privacy_status,
-                            'selfDeclaredMadeForKids': False
-                        }
-                    }
-                    
-                    # Add scheduling if provided
-                    if schedule_time:
-                        metadata['status']['privacyStatus'] = 'private'
-                        metadata['status']['publishAt'] = schedule_time
-                    
-                    # Upload video using resumable upload
-                    upload_url = await self._initiate_upload(metadata)
-                    video_id = await self._complete_upload(upload_url, video_data)
-                    
-                    return video_id
+        """
+        Upload video to YouTube
         
-        except Exception as e:
-            raise Exception(f"Video upload error: {str(e)}")
+        The video is streamed from its URL straight into the upload, so it is
+        never held in memory as a whole. Sources need not report its size.
+        """
+        # Download video
+        async with self._download(video_url) as video_response:
+            if video_response.status_code != 200:
+                raise PostError("Failed to download video")
+            
+            # Oversized videos are refused up front when the source says so
+            declared_size(video_response, MAX_VIDEO_BYTES)
+            
+            # Prepare metadata
+            metadata = {
+                'snippet': {
+                    'title': title,
+                    'description': description,
+                    'categoryId': category_id,
+                    'tags': []
+                },
+                'status': {
+                    'privacyStatus': privacy_status,
+                    'selfDeclaredMadeForKids': False
+                }
+            }
+            
+            # Add scheduling if provided
+            if schedule_time:
+                metadata['status']['privacyStatus'] = 'private'
+                metadata['status']['publishAt'] = schedule_time
+            
+            # Upload video using resumable upload
+            await self.ensure_authenticated()
+            upload_url = await self._initiate_upload(metadata)
+            video_id = await self._complete_upload(
+                upload_url,
+                video_response.aiter_bytes(STREAM_CHUNK_SIZE)
+            )
+            
+            return video_id
     
     async def _initiate_upload(self, metadata: Dict) -> str:
         """Initiate resumable upload"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.upload_url}/videos",
-                    params={
-                        'uploadType': 'resumable',
-                        'part': 'snippet,status'
-                    },
-                    headers={
-                        'Authorization': f'Bearer {self.access_token}',
-                        'Content-Type': 'application/json',
-                        'X-Upload-Content-Type': 'video/*'
-                    },
-                    json=metadata
-                ) as response:
-                    if response.status in [200, 201]:
-                        # Get upload URL from Location header
-                        upload_url = response.headers.get('Location')
-                        return upload_url
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Upload initiation failed: {error_data}")
+        response = await self._request(
+            'POST',
+            self._video_upload_url,
+            params={
+                'uploadType': 'resumable',
+                'part': 'snippet,status'
+            },
+            headers=self._upload_init_headers,
+            content=orjson.dumps(metadata)
+        )
+        if response.status_code in [200, 201]:
+            # Get upload URL from Location header
+            upload_url = response.headers.get('Location')
+            return upload_url
+        else:
+            raise PostError(f"Upload initiation failed: {error_body(response)}")
+    
+    async def _complete_upload(
+        self,
+        upload_url: str,
+        video_stream: AsyncIterator[bytes]
+    ) -> str:
+        """
+        Send the video to a resumable upload session in UPLOAD_CHUNK_SIZE pieces
         
-        except Exception as e:
-            raise Exception(f"Upload initiation error: {str(e)}")
+        The protocol only accepts chunks in order, so they go up one at a time;
+        a failed chunk is retried on its own instead of restarting the upload.
+        Chunks are sent with an unknown ("*") total until the stream ends, and
+        the real size goes with the last one.
+        """
+        buffer = bytearray()
+        start = 0
+        async for part in video_stream:
+            buffer += part
+            if start + len(buffer) > MAX_VIDEO_BYTES:
+                raise PostError(f"Video is over the {MAX_VIDEO_BYTES} byte limit")
+            # Only full chunks known not to be the last one
+            while len(buffer) > UPLOAD_CHUNK_SIZE:
+                offset, _ = await self._put_chunk(
+                    upload_url, bytes(memoryview(buffer)[:UPLOAD_CHUNK_SIZE]), start, None
+                )
+                if offset <= start:
+                    raise PostError(f"Upload stalled at byte {start}")
+                del buffer[:offset - start]
+                start = offset
+        
+        video_size = start + len(buffer)
+        if not video_size:
+            raise PostError("Video is empty")
+        
+        # Last chunk (and any bytes the server did not commit yet)
+        while True:
+            offset, result = await self._put_chunk(upload_url, bytes(buffer), start, video_size)
+            if result is not None:
+                return result.get('id')
+            if offset <= start:
+                raise PostError(f"Upload stalled at byte {start}/{video_size}")
+            del buffer[:offset - start]
+            start = offset
     
-    async def _complete_upload(self, upload_url: str, video_data: bytes) -> str:
-        """Complete resumable upload"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.put(
-                    upload_url,
-                    data=video_data,
-                    headers={
-                        'Content-Type': 'video/*'
-                    }
-                ) as response:
-                    if response.status in [200, 201]:
-                        result = await response.json()
-                        return result.get('id')
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Upload completion failed: {error_data}")
+    async def _put_chunk(
+        self,
+        upload_url: str,
+        chunk: bytes,
+        start: int,
+        total: Optional[int]
+    ) -> Tuple[int, Optional[Dict]]:
+        """
+        PUT one chunk, retrying transient failures
         
-        except Exception as e:
-            raise Exception(f"Upload completion error: {str(e)}")
+        total is None until the last chunk. Returns (offset, video) where
+        offset is the number of bytes the server has committed and video is
+        the final response once the upload is done.
+        """
+        client = await self._get_client()
+        headers = {
+            'Content-Type': 'video/*',
+            'Content-Range': f"bytes {start}-{start + len(chunk) - 1}/{'*' if total is None else total}"
+        }
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self._host_sem:
+                    response = await client.put(upload_url, content=chunk, headers=headers)
+                if response.status_code in [200, 201]:
+                    return total, orjson.loads(response.content)
+                if response.status_code == 308:
+                    return _committed_offset(response), None
+                if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    raise PostError(f"Chunk upload failed: {error_body(response)}")
+            except httpx.TransportError:
+                if attempt == MAX_RETRIES:
+                    raise
+            
+            await asyncio.sleep(backoff_delay(attempt))
+            
+            # The interrupted PUT may have been partly stored; resume from there
+            offset = await self._query_upload_offset(upload_url, total)
+            if offset > start:
+                return offset, None
+    
+    async def _query_upload_offset(self, upload_url: str, total: Optional[int]) -> int:
+        """Ask the resumable session how many bytes it has stored"""
+        client = await self._get_client()
+        async with self._host_sem:
+            response = await client.put(
+                upload_url,
+                headers={'Content-Range': f"bytes */{'*' if total is None else total}"}
+            )
+        return _committed_offset(response) if response.status_code == 308 else 0
     
     async def update_video(
         self,
         video_id: str,
         title: Optional[str] = None,
         description: Optional[str] = None,
-        tags: Optional[List[str]] = None
+        tags: Optional[List[str]] = None,
+        current_snippet: Optional[Dict] = None
     ) -> Dict:
-        """Update video metadata"""
+        """
+        Update video metadata
+        
+        current_snippet, when the caller already has it, saves fetching it
+        """
+        if not any((title, description, tags)):
+            return {
+                'success': True,
+                'video_id': video_id,
+                'message': 'No changes'
+            }
+        
         try:
-            if not self.authenticated:
-                await self.authenticate()
+            await self.ensure_authenticated()
             
-            # Get current video details
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.api_url}/videos",
+            if current_snippet is None:
+                # Get current video details, only the fields sent back below
+                get_response = await self._request(
+                    'GET',
+                    self._videos_url,
                     params={
                         'part': 'snippet',
-                        'id': video_id
+                        'id': video_id,
+                        'fields': SNIPPET_FIELDS
                     },
-                    headers={
-                        'Authorization': f'Bearer {self.access_token}'
-                    }
-                ) as get_response:
-                    if get_response.status == 200:
-                        result = await get_response.json()
-                        if not result.get('items'):
-                            raise Exception("Video not found")
-                        
-                        video = result['items'][0]
-                        snippet = video.get('snippet', {})
-                        
-                        # Update fields
-                        if title:
-                            snippet['title'] = title
-                        if description:
-                            snippet['description'] = description
-                        if tags:
-                            snippet['tags'] = tags
-                        
-                        # Update video
-                        async with session.put(
-                            f"{self.api_url}/videos",
-                            params={'part': 'snippet'},
-                            headers={
-                                'Authorization': f'Bearer {self.access_token}',
-                                'Content-Type': 'application/json'
-                            },
-                            json={
-                                'id': video_id,
-                                'snippet': snippet
-                            }
-                        ) as update_response:
-                            if update_response.status == 200:
-                                return {
-                                    'success': True,
-                                    'video_id': video_id,
-                                    'message': 'Video updated successfully'
-                                }
-                            else:
-                                error_data = await update_response.json()
-                                raise Exception(f"Video update failed: {error_data}")
-                    else:
-                        error_data = await get_response.json()
-                        raise Exception(f"Failed to get video: {error_data}")
+                    headers=self._auth_headers
+                )
+                if get_response.status_code != 200:
+                    raise PostError(f"Failed to get video: {error_body(get_response)}")
+                
+                result = orjson.loads(get_response.content)
+                if not result.get('items'):
+                    raise PostError("Video not found")
+                current_snippet = result['items'][0].get('snippet', {})
+            
+            snippet = dict(current_snippet)
+            
+            # Update fields
+            if title:
+                snippet['title'] = title
+            if description:
+                snippet['description'] = description
+            if tags:
+                snippet['tags'] = tags
+            
+            # Update video
+            update_response = await self._request(
+                'PUT',
+                self._videos_url,
+                params={'part': 'snippet'},
+                headers=self._json_headers,
+                content=orjson.dumps({
+                    'id': video_id,
+                    'snippet': snippet
+                })
+            )
+            if update_response.status_code == 200:
+                return {
+                    'success': True,
+                    'video_id': video_id,
+                    'message': 'Video updated successfully'
+                }
+            else:
+                raise PostError(f"Video update failed: {error_body(update_response)}")
         
-        except Exception as e:
-            raise Exception(f"Video update error: {str(e)}")
+        except httpx.HTTPError as e:
+            raise PostError(f"YouTube video update error: {e}") from e
@@ -3,18 +3,27 @@ Unit tests for Multi-Platform Social Media Posting API
 """
 
 import pytest
+import pytest_asyncio
 import asyncio
-from fastapi.testclient import TestClient
+import httpx
 from main import app
 
-client = TestClient(app)
+# Every test in this module runs on the event loop
+pytestmark = pytest.mark.asyncio
+
+@pytest_asyncio.fixture
+async def client():
+    """In-process client that calls the ASGI app directly on the test loop"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
 
 class TestRootEndpoints:
     """Test root and health endpoints"""
     
-    def test_root_endpoint(self):
+    async def test_root_endpoint(self, client):
         """Test root endpoint returns correct information"""
-        response = client.get("/")
+        response = await client.get("/")
         assert response.status_code == 200
         
         data = response.json()
@@ -23,9 +32,9 @@ class TestRootEndpoints:
         assert "supported_platforms" in data
         assert len(data["supported_platforms"]) == 6
     
-    def test_health_check(self):
+    async def test_health_check(self, client):
         """Test health check endpoint"""
-        response = client.get("/health")
+        response = await client.get("/health")
         assert response.status_code == 200
         
         data = response.json()
@@ -33,9 +42,9 @@ class TestRootEndpoints:
         assert "timestamp" in data
         assert "platforms_available" in data
     
-    def test_get_platforms(self):
+    async def test_get_platforms(self, client):
         """Test get platforms endpoint"""
-        response = client.get("/api/platforms")
+        response = await client.get("/api/platforms")
         assert response.status_code == 200
         
         data = response.json()
@@ -54,15 +63,15 @@ class TestRootEndpoints:
 class TestPostEndpoints:
     """Test posting endpoints"""
     
-    def test_post_to_multiple_platforms_validation(self):
+    async def test_post_to_multiple_platforms_validation(self, client):
         """Test posting with invalid data"""
         # Missing required fields
-        response = client.post("/api/post", json={})
+        response = await client.post("/api/post", json={})
         assert response.status_code == 422
     
-    def test_post_to_multiple_platforms_structure(self):
+    async def test_post_to_multiple_platforms_structure(self, client):
         """Test posting returns correct structure"""
-        response = client.post("/api/post", json={
+        response = await client.post("/api/post", json={
             "text": "Test post",
             "platforms": ["facebook"],
             "media_urls": []
@@ -82,9 +91,9 @@ class TestPostEndpoints:
         assert "platform" in result
         assert "message" in result
     
-    def test_post_to_invalid_platform(self):
+    async def test_post_to_invalid_platform(self, client):
         """Test posting to non-existent platform"""
-        response = client.post("/api/post", json={
+        response = await client.post("/api/post", json={
             "text": "Test post",
             "platforms": ["invalid_platform"],
             "media_urls": []
@@ -95,10 +104,25 @@ class TestPostEndpoints:
         
         assert data[0]["success"] == False
         assert "not supported" in data[0]["message"].lower()
-    
-    def test_post_to_single_platform_validation(self):
+
+    async def test_post_results_keep_platform_order(self, client):
+        """Test results follow the requested platform order"""
+        response = await client.post("/api/post", json={
+            "text": "Test post",
+            "platforms": ["invalid_platform", "facebook", "invalid_platform"],
+            "media_urls": []
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+
+        assert [r["platform"] for r in data] == ["invalid_platform", "facebook", "invalid_platform"]
+        assert "not supported" in data[0]["message"].lower()
+        assert "not supported" in data[2]["message"].lower()
+
+    async def test_post_to_single_platform_validation(self, client):
         """Test single platform posting validation"""
-        response = client.post(
+        response = await client.post(
             "/api/post/facebook",
             data={"text": ""}
         )
@@ -106,9 +130,9 @@ class TestPostEndpoints:
         # Empty text should fail validation
         assert response.status_code == 422
     
-    def test_post_to_single_platform_invalid(self):
+    async def test_post_to_single_platform_invalid(self, client):
         """Test posting to invalid single platform"""
-        response = client.post(
+        response = await client.post(
             "/api/post/invalid_platform",
             data={"text": "Test"}
         )
@@ -118,19 +142,19 @@ class TestPostEndpoints:
 class TestUploadEndpoint:
     """Test media upload endpoint"""
     
-    def test_upload_no_file(self):
+    async def test_upload_no_file(self, client):
         """Test upload without file"""
-        response = client.post("/api/upload")
+        response = await client.post("/api/upload")
         assert response.status_code == 422
     
-    def test_upload_with_file(self):
+    async def test_upload_with_file(self, client):
         """Test upload with file"""
         # Create a fake file
         files = {
             "file": ("test.txt", b"test content", "text/plain")
         }
         
-        response = client.post("/api/upload", files=files)
+        response = await client.post("/api/upload", files=files)
         
         # Should succeed or fail gracefully
         assert response.status_code in [200, 500]
@@ -144,9 +168,9 @@ class TestUploadEndpoint:
 class TestAuthEndpoint:
     """Test authentication endpoints"""
     
-    def test_auth_invalid_platform(self):
+    async def test_auth_invalid_platform(self, client):
         """Test authentication with invalid platform"""
-        response = client.post(
+        response = await client.post(
             "/api/auth/invalid_platform",
             json={
                 "platform": "invalid_platform",
@@ -156,9 +180,9 @@ class TestAuthEndpoint:
         
         assert response.status_code == 400
     
-    def test_auth_missing_credentials(self):
+    async def test_auth_missing_credentials(self, client):
         """Test authentication without credentials"""
-        response = client.post(
+        response = await client.post(
             "/api/auth/facebook",
             json={
                 "platform": "facebook"
@@ -168,65 +192,112 @@ class TestAuthEndpoint:
         # Should fail due to missing credentials
         assert response.status_code in [401, 422]
 
-@pytest.mark.asyncio
 class TestAsyncOperations:
     """Test async operations"""
     
-    async def test_concurrent_posts(self):
+    async def test_concurrent_posts(self, client):
         """Test posting to multiple platforms concurrently"""
-        # This would test the async nature of the API
-        # In real scenario, this would verify concurrent execution
-        pass
+        responses = await asyncio.gather(*(
+            client.post("/api/post", json={
+                "text": f"Test post {i}",
+                "platforms": ["invalid_platform", "facebook"],
+                "media_urls": []
+            })
+            for i in range(5)
+        ))
+        
+        for response in responses:
+            assert response.status_code == 200
+            data = response.json()
+            assert [r["platform"] for r in data] == ["invalid_platform", "facebook"]
 
 class TestErrorHandling:
     """Test error handling"""
     
-    def test_malformed_json(self):
+    async def test_malformed_json(self, client):
         """Test handling of malformed JSON"""
-        response = client.post(
+        response = await client.post(
             "/api/post",
-            data="invalid json",
+            content="invalid json",
             headers={"Content-Type": "application/json"}
         )
         
         assert response.status_code == 422
     
-    def test_missing_content_type(self):
+    async def test_missing_content_type(self, client):
         """Test handling of missing content type"""
-        response = client.post("/api/post", data="test")
+        response = await client.post("/api/post", content="test")
         assert response.status_code in [422, 400]
 
 class TestDataValidation:
     """Test data validation"""
     
-    def test_text_validation(self):
+    async def test_text_validation(self, client):
         """Test text field validation"""
         # Empty text
-        response = client.post("/api/post", json={
+        response = await client.post("/api/post", json={
             "text": "",
             "platforms": ["facebook"]
         })
         assert response.status_code == 422
     
-    def test_platforms_validation(self):
+    async def test_platforms_validation(self, client):
         """Test platforms field validation"""
         # Empty platforms list
-        response = client.post("/api/post", json={
+        response = await client.post("/api/post", json={
             "text": "Test",
             "platforms": []
         })
         assert response.status_code == 422
     
-    def test_media_urls_validation(self):
+    async def test_media_urls_validation(self, client):
         """Test media URLs validation"""
-        response = client.post("/api/post", json={
+        response = await client.post("/api/post", json={
             "text": "Test",
             "platforms": ["facebook"],
             "media_urls": ["not_a_valid_url"]
         })
         
-        # Should still process but may fail at platform level
+        # Media URLs are validated before any platform is called
+        assert response.status_code == 422
+    
+    async def test_long_media_url_accepted(self, client):
+        """Test long presigned URLs are not rejected"""
+        response = await client.post("/api/post", json={
+            "text": "Test",
+            "platforms": ["invalid_platform"],
+            "media_urls": ["https://cdn.example.com/video.mp4?signature=" + "a" * 3000]
+        })
         assert response.status_code == 200
+    
+    async def test_null_media_urls_accepted(self, client):
+        """Test media_urls may be sent as null, meaning no media"""
+        response = await client.post("/api/post", json={
+            "text": "Test",
+            "platforms": ["invalid_platform"],
+            "media_urls": None
+        })
+        assert response.status_code == 200
+    
+    async def test_media_urls_limit(self, client):
+        """Test media URLs count limit"""
+        response = await client.post("/api/post", json={
+            "text": "Test",
+            "platforms": ["facebook"],
+            "media_urls": [f"https://example.com/{i}.jpg" for i in range(11)]
+        })
+        assert response.status_code == 422
+    
+    async def test_single_platform_media_urls_limit(self, client):
+        """Test the form endpoint rejects too many media URLs like /api/post"""
+        response = await client.post(
+            "/api/post/facebook",
+            data={
+                "text": "Test",
+                "media_urls": ",".join(f"https://example.com/{i}.jpg" for i in range(11))
+            }
+        )
+        assert response.status_code == 422
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
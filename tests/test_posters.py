@@ -0,0 +1,579 @@
+"""
+Unit tests for the platform posters, with HTTP calls served by httpx.MockTransport
+"""
+
+import pytest
+import asyncio
+import gzip
+import httpx
+import orjson
+from urllib.parse import parse_qs
+from platforms import base_poster
+from platforms.base_poster import (
+    BasePoster, PostError, MAX_CONCURRENT_DOWNLOADS, MAX_RETRIES, RETRY_MAX_DELAY
+)
+from platforms import tiktok_api, x_api, youtube_api
+from platforms.facebook_api import FacebookPoster
+from platforms.tiktok_api import TikTokPoster, _chunk_plan
+from platforms.x_api import XPoster
+from platforms.youtube_api import YouTubePoster
+
+# Every test in this module runs on the event loop
+pytestmark = pytest.mark.asyncio
+
+@pytest.fixture
+def mock_client():
+    """Install a shared client whose requests are answered by the test's handler"""
+    def install(handler):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        BasePoster.set_client(client)
+        return client
+    
+    yield install
+    BasePoster.set_client(None)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of sleeping"""
+    delays = []
+    
+    async def sleep(delay):
+        delays.append(delay)
+    
+    monkeypatch.setattr(base_poster.asyncio, 'sleep', sleep)
+    return delays
+
+def replay(*outcomes):
+    """Handler answering successive requests with the given responses or errors"""
+    calls = []
+    
+    def handler(request):
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(request)
+        if isinstance(outcome, type):
+            raise outcome("simulated failure", request=request)
+        return httpx.Response(outcome.status_code, headers=outcome.headers, content=outcome.content)
+    
+    handler.calls = calls
+    return handler
+
+class StubPoster(BasePoster):
+    """Minimal poster for exercising BasePoster behaviour"""
+    
+    async def authenticate(self, access_token=None, api_key=None, api_secret=None, additional_params=None):
+        return {}
+    
+    async def create_post(self, text, media_urls=None, schedule_time=None):
+        return {}
+
+class FlakyPoster(BasePoster):
+    """Poster whose verification always fails, like a transient network error"""
+    
+    async def authenticate(self, access_token=None, api_key=None, api_secret=None, additional_params=None):
+        self.authenticated = False
+        raise PostError("temporary failure")
+    
+    async def create_post(self, text, media_urls=None, schedule_time=None):
+        return {}
+
+class TestAuthentication:
+    """Test cached authentication"""
+    
+    async def test_failed_refresh_keeps_verification(self):
+        """Test a failed background refresh leaves the current token usable"""
+        poster = FlakyPoster('flaky')
+        poster.authenticated = True
+        
+        await poster._refresh_auth()
+        
+        assert poster.authenticated
+    
+    @pytest.mark.parametrize('data', [
+        gzip.compress(b'{"expiry": 1e18, "result": {}}')[:-6],
+        b'not gzip',
+        gzip.compress(b'not json'),
+        gzip.compress(b'{"result": {}}'),
+        gzip.compress(b'[1, 2]'),
+        gzip.compress(b'{"expiry": "soon", "result": {}}'),
+    ])
+    async def test_damaged_cache_is_a_miss(self, tmp_path, monkeypatch, data):
+        """Test truncated or malformed cache files are ignored instead of raising"""
+        monkeypatch.setattr(base_poster, 'AUTH_CACHE_DIR', tmp_path)
+        poster = StubPoster('stub')
+        poster.access_token = 'token'
+        poster._auth_cache_path('scope').write_bytes(data)
+        
+        assert poster._load_auth_cache('scope') is None
+        assert not poster.authenticated
+    
+    async def test_cache_round_trip(self, tmp_path, monkeypatch):
+        """Test a stored verification is read back without leaving temp files"""
+        monkeypatch.setattr(base_poster, 'AUTH_CACHE_DIR', tmp_path)
+        poster = StubPoster('stub')
+        poster.access_token = 'token'
+        
+        poster._store_auth_cache('scope', {'id': '1'})
+        
+        assert poster._load_auth_cache('scope') == {'id': '1'}
+        assert poster.authenticated
+        assert [path.name for path in tmp_path.iterdir()] == [poster._auth_cache_path('scope').name]
+
+class TestRequestRetries:
+    """Test BasePoster._request retry policy"""
+    
+    async def test_returns_last_response_after_max_retries(self, mock_client, sleeps):
+        """Test a persistent 5xx is retried MAX_RETRIES times, then returned"""
+        handler = replay(httpx.Response(500))
+        mock_client(handler)
+        
+        response = await StubPoster('stub')._request('GET', 'https://api.example.com/')
+        
+        assert response.status_code == 500
+        assert len(handler.calls) == MAX_RETRIES + 1
+        assert len(sleeps) == MAX_RETRIES
+    
+    async def test_honours_retry_after(self, mock_client, sleeps):
+        """Test Retry-After sets the delay before the next attempt"""
+        handler = replay(httpx.Response(429, headers={'Retry-After': '2'}), httpx.Response(200))
+        mock_client(handler)
+        
+        response = await StubPoster('stub')._request('GET', 'https://api.example.com/')
+        
+        assert response.status_code == 200
+        assert sleeps == [2.0]
+    
+    async def test_long_retry_after_is_not_waited(self, mock_client, sleeps):
+        """Test a Retry-After beyond RETRY_MAX_DELAY returns the response at once"""
+        retry_after = str(int(RETRY_MAX_DELAY) + 1)
+        handler = replay(httpx.Response(429, headers={'Retry-After': retry_after}))
+        mock_client(handler)
+        
+        response = await StubPoster('stub')._request('GET', 'https://api.example.com/')
+        
+        assert response.status_code == 429
+        assert len(handler.calls) == 1
+        assert sleeps == []
+    
+    @pytest.mark.parametrize('outcome', [
+        httpx.Response(500),
+        httpx.Response(503),
+        httpx.ReadTimeout,
+        httpx.RemoteProtocolError
+    ])
+    async def test_post_not_retried_when_it_may_have_landed(self, mock_client, sleeps, outcome):
+        """Test a POST is sent once when the server may already have processed it"""
+        handler = replay(outcome, httpx.Response(201))
+        mock_client(handler)
+        
+        poster = StubPoster('stub')
+        if isinstance(outcome, httpx.Response):
+            response = await poster._request('POST', 'https://api.example.com/')
+            assert response.status_code == outcome.status_code
+        else:
+            with pytest.raises(outcome):
+                await poster._request('POST', 'https://api.example.com/')
+        
+        assert len(handler.calls) == 1
+    
+    @pytest.mark.parametrize('outcome', [
+        httpx.Response(429),
+        httpx.Response(503, headers={'Retry-After': '1'}),
+        httpx.ConnectError,
+        httpx.ConnectTimeout
+    ])
+    async def test_post_retried_when_it_did_not_land(self, mock_client, sleeps, outcome):
+        """Test a POST is retried when the first attempt provably had no effect"""
+        handler = replay(outcome, httpx.Response(201))
+        mock_client(handler)
+        
+        response = await StubPoster('stub')._request('POST', 'https://api.example.com/')
+        
+        assert response.status_code == 201
+        assert len(handler.calls) == 2
+    
+    async def test_idempotent_post_retried(self, mock_client, sleeps):
+        """Test idempotent=True retries a POST like a GET"""
+        handler = replay(httpx.Response(502), httpx.Response(200))
+        mock_client(handler)
+        
+        response = await StubPoster('stub')._request(
+            'POST', 'https://api.example.com/', idempotent=True
+        )
+        
+        assert response.status_code == 200
+        assert len(handler.calls) == 2
+
+class TestConcurrencyLimits:
+    """Test per-poster concurrency limits"""
+    
+    async def test_downloads_are_capped(self, mock_client):
+        """Test at most MAX_CONCURRENT_DOWNLOADS media downloads are open at once"""
+        mock_client(lambda request: httpx.Response(200, content=b'media'))
+        poster = StubPoster('stub')
+        open_now = peak = 0
+        
+        async def download():
+            nonlocal open_now, peak
+            async with poster._download('https://cdn.example.com/media'):
+                open_now += 1
+                peak = max(peak, open_now)
+                await asyncio.sleep(0.01)
+                open_now -= 1
+        
+        await asyncio.gather(*(download() for _ in range(MAX_CONCURRENT_DOWNLOADS * 2)))
+        
+        assert peak == MAX_CONCURRENT_DOWNLOADS
+
+class TestSharedClient:
+    """Test the process-wide client lifecycle"""
+    
+    async def test_closing_a_poster_keeps_shared_client(self):
+        """Test closing one poster leaves the client other posters use open"""
+        async with StubPoster('first') as first:
+            client = await first._get_client()
+        
+        assert not client.is_closed
+        assert await StubPoster('second')._get_client() is client
+        await BasePoster.close_shared_client()
+    
+    async def test_close_shared_client(self):
+        """Test the shutdown call closes the shared client and a new one is created after"""
+        client = await StubPoster('stub')._get_client()
+        
+        await BasePoster.close_shared_client()
+        
+        assert client.is_closed
+        assert BasePoster._shared_client is None
+        replacement = await StubPoster('stub')._get_client()
+        assert replacement is not client
+        await BasePoster.close_shared_client()
+
+class TestFacebookPoster:
+    """Test Facebook Graph API requests"""
+    
+    async def test_multi_photo_batch_body(self, mock_client):
+        """Test the batch feed post references the photo IDs literally"""
+        sent = []
+        
+        def handler(request):
+            sent.append(request)
+            return httpx.Response(200, json=[
+                {'code': 200, 'body': '{"id":"p0"}'},
+                {'code': 200, 'body': '{"id":"p1"}'},
+                {'code': 200, 'body': '{"id":"page_post"}'}
+            ])
+        
+        mock_client(handler)
+        poster = FacebookPoster()
+        poster.page_id = 'page'
+        poster._set_page_urls()
+        poster._token_kv = 'access_token=token'
+        poster.authenticated = True
+        
+        result = await poster.create_post(
+            'Hello & welcome',
+            media_urls=['https://cdn.example.com/a.jpg', 'https://cdn.example.com/b.jpg']
+        )
+        
+        assert result['post_id'] == 'page_post'
+        assert len(sent) == 1
+        form = parse_qs(sent[0].content.decode())
+        assert form['access_token'] == ['token']
+        assert orjson.loads(form['batch'][0]) == [
+            {
+                'method': 'POST',
+                'relative_url': 'page/photos',
+                'name': 'photo0',
+                'body': 'url=https%3A%2F%2Fcdn.example.com%2Fa.jpg&published=false'
+            },
+            {
+                'method': 'POST',
+                'relative_url': 'page/photos',
+                'name': 'photo1',
+                'body': 'url=https%3A%2F%2Fcdn.example.com%2Fb.jpg&published=false'
+            },
+            {
+                'method': 'POST',
+                'relative_url': 'page/feed',
+                'body': (
+                    'message=Hello+%26+welcome'
+                    '&attached_media[0]={"media_fbid":"{result=photo0:$.id}"}'
+                    '&attached_media[1]={"media_fbid":"{result=photo1:$.id}"}'
+                )
+            }
+        ]
+    
+    async def test_upload_photo_error_quotes_body(self, mock_client):
+        """Test a rejected photo upload reports the status and response body"""
+        mock_client(lambda request: httpx.Response(400, content=b'{"error":"bad url"}'))
+        poster = FacebookPoster()
+        poster.page_id = 'page'
+        poster._set_page_urls()
+        
+        with pytest.raises(PostError, match='400.*bad url'):
+            await poster.upload_photo('https://cdn.example.com/a.jpg')
+
+class TestXPoster:
+    """Test X API requests"""
+    
+    async def test_oauth1_requests_keep_their_bodies(self, mock_client, monkeypatch):
+        """Test OAuth 1.0a signing sends the media and tweet bodies intact"""
+        monkeypatch.setattr(x_api, 'X_ACCESS_TOKEN_SECRET', 'token-secret')
+        sent = []
+        
+        def handler(request):
+            sent.append(request)
+            if request.url.host == 'cdn.example.com':
+                return httpx.Response(200, headers={'Content-Type': 'image/png'}, content=b'PNGDATA')
+            if request.url.path.endswith('/users/me'):
+                return httpx.Response(200, json={'data': {'id': '1', 'username': 'miai'}})
+            if request.url.host == 'upload.twitter.com':
+                return httpx.Response(200, json={'media_id_string': 'media'})
+            return httpx.Response(201, json={'data': {'id': 'tweet'}})
+        
+        mock_client(handler)
+        poster = XPoster()
+        poster.bearer_token = None
+        poster.api_key = 'key'
+        poster.api_secret = 'secret'
+        await poster.authenticate(access_token='token')
+        
+        result = await poster.create_post('Hello', media_urls=['https://cdn.example.com/photo.png'])
+        
+        assert result['post_id'] == 'tweet'
+        upload = next(r for r in sent if r.url.host == 'upload.twitter.com')
+        tweet = next(r for r in sent if r.url.path.endswith('/tweets'))
+        assert b'PNGDATA' in upload.content
+        assert upload.headers['Authorization'].startswith('OAuth ')
+        assert orjson.loads(tweet.content) == {'text': 'Hello', 'media': {'media_ids': ['media']}}
+        assert tweet.headers['Authorization'].startswith('OAuth ')
+
+    def image_source(self, mock_client, *parts):
+        """Serve an image without Content-Length and accept media uploads"""
+        uploads = []
+        
+        def handler(request):
+            if request.url.host == 'cdn.example.com':
+                return httpx.Response(200, headers={'Content-Type': 'image/jpeg'}, content=stream_of(*parts))
+            uploads.append(request)
+            return httpx.Response(200, json={'media_id_string': 'media'})
+        
+        mock_client(handler)
+        poster = XPoster()
+        poster.authenticated = True
+        return poster, uploads
+    
+    async def test_image_without_content_length(self, mock_client):
+        """Test still images are uploaded even when the source sends no Content-Length"""
+        poster, uploads = self.image_source(mock_client, b'JPEG', b'DATA')
+        
+        media_id = await poster._upload_media('https://cdn.example.com/photo.jpg')
+        
+        assert media_id == 'media'
+        assert b'JPEGDATA' in uploads[0].content
+    
+    async def test_oversized_image_rejected(self, mock_client, monkeypatch):
+        """Test a still image is rejected once it streams past MAX_IMAGE_BYTES"""
+        monkeypatch.setattr(x_api, 'MAX_IMAGE_BYTES', 6)
+        poster, uploads = self.image_source(mock_client, b'JPEG', b'DATA')
+        
+        with pytest.raises(PostError, match='limit'):
+            await poster._upload_media('https://cdn.example.com/photo.jpg')
+        assert uploads == []
+
+async def stream_of(*parts):
+    """Async byte stream yielding the given parts"""
+    for part in parts:
+        yield part
+
+def upload_session(*replies):
+    """Resumable upload handler answering each PUT, keyed by its Content-Range"""
+    pending = {}
+    for content_range, reply in replies:
+        pending.setdefault(content_range, []).append(reply)
+    sent = []
+    
+    def handler(request):
+        content_range = request.headers['Content-Range']
+        sent.append((content_range, request.content))
+        reply = pending[content_range].pop(0)
+        if isinstance(reply, type):
+            raise reply("simulated failure", request=request)
+        return reply
+    
+    handler.sent = sent
+    return handler
+
+def committed(last_byte):
+    """308 reply reporting the session has stored bytes 0..last_byte"""
+    return httpx.Response(308, headers={'Range': f'bytes=0-{last_byte}'})
+
+class TestYouTubeResumableUpload:
+    """Test YouTubePoster._complete_upload against a resumable upload session"""
+    
+    @pytest.fixture(autouse=True)
+    def small_chunks(self, monkeypatch):
+        """Use 4-byte chunks so small payloads span several PUTs"""
+        monkeypatch.setattr(youtube_api, 'UPLOAD_CHUNK_SIZE', 4)
+    
+    async def test_uploads_chunks_in_order(self, mock_client):
+        """Test chunks carry an open-ended Content-Range until the last, which gives the size"""
+        handler = upload_session(
+            ('bytes 0-3/*', committed(3)),
+            ('bytes 4-7/*', committed(7)),
+            ('bytes 8-9/10', httpx.Response(200, json={'id': 'video'}))
+        )
+        mock_client(handler)
+        
+        video_id = await YouTubePoster()._complete_upload(
+            'https://upload.example.com/session', stream_of(b'012', b'3456789')
+        )
+        
+        assert video_id == 'video'
+        assert handler.sent == [
+            ('bytes 0-3/*', b'0123'),
+            ('bytes 4-7/*', b'4567'),
+            ('bytes 8-9/10', b'89')
+        ]
+    
+    async def test_resumes_after_partial_commit(self, mock_client):
+        """Test a chunk the server only partly stored is resent from its Range offset"""
+        handler = upload_session(
+            ('bytes 0-3/*', committed(1)),
+            ('bytes 2-5/*', committed(5)),
+            ('bytes 6-9/10', httpx.Response(201, json={'id': 'video'}))
+        )
+        mock_client(handler)
+        
+        video_id = await YouTubePoster()._complete_upload(
+            'https://upload.example.com/session', stream_of(b'0123456789')
+        )
+        
+        assert video_id == 'video'
+        assert [body for _, body in handler.sent] == [b'0123', b'2345', b'6789']
+    
+    async def test_stalled_upload_raises(self, mock_client):
+        """Test an upload that stops making progress fails instead of looping"""
+        handler = upload_session(('bytes 0-3/4', httpx.Response(308)))
+        mock_client(handler)
+        
+        with pytest.raises(PostError, match='stalled'):
+            await YouTubePoster()._complete_upload(
+                'https://upload.example.com/session', stream_of(b'0123')
+            )
+    
+    async def test_failed_chunk_resumes_from_queried_offset(self, mock_client, sleeps):
+        """Test a chunk whose PUT failed is resumed from the offset the session reports"""
+        handler = upload_session(
+            ('bytes 0-3/*', httpx.ReadTimeout),
+            ('bytes */*', committed(3)),
+            ('bytes 4-7/*', committed(7)),
+            ('bytes 8-9/10', httpx.Response(200, json={'id': 'video'}))
+        )
+        mock_client(handler)
+        
+        video_id = await YouTubePoster()._complete_upload(
+            'https://upload.example.com/session', stream_of(b'0123456789')
+        )
+        
+        assert video_id == 'video'
+        assert [content_range for content_range, _ in handler.sent] == [
+            'bytes 0-3/*', 'bytes */*', 'bytes 4-7/*', 'bytes 8-9/10'
+        ]
+        assert len(sleeps) == 1
+    
+    async def test_chunk_boundary_ends_with_sized_chunk(self, mock_client):
+        """Test a video ending on a chunk boundary still sends its size with the last chunk"""
+        handler = upload_session(
+            ('bytes 0-3/*', committed(3)),
+            ('bytes 4-7/8', httpx.Response(200, json={'id': 'video'}))
+        )
+        mock_client(handler)
+        
+        video_id = await YouTubePoster()._complete_upload(
+            'https://upload.example.com/session', stream_of(b'0123', b'4567')
+        )
+        
+        assert video_id == 'video'
+        assert [body for _, body in handler.sent] == [b'0123', b'4567']
+    
+    async def test_oversized_video_raises(self, mock_client, monkeypatch):
+        """Test MAX_VIDEO_BYTES is enforced against the bytes actually streamed"""
+        monkeypatch.setattr(youtube_api, 'MAX_VIDEO_BYTES', 6)
+        handler = upload_session(('bytes 0-3/*', committed(3)))
+        mock_client(handler)
+        
+        with pytest.raises(PostError, match='limit'):
+            await YouTubePoster()._complete_upload(
+                'https://upload.example.com/session', stream_of(b'01234', b'56')
+            )
+    
+    async def test_source_without_content_length(self, mock_client):
+        """Test a video whose source sends no Content-Length is uploaded"""
+        handler = upload_session(
+            ('bytes 0-3/*', committed(3)),
+            ('bytes 4-5/6', httpx.Response(200, json={'id': 'video'}))
+        )
+        
+        def route(request):
+            if request.url.host == 'cdn.example.com':
+                return httpx.Response(200, content=stream_of(b'012', b'345'))
+            if request.method == 'POST':
+                return httpx.Response(200, headers={'Location': 'https://upload.example.com/session'})
+            return handler(request)
+        
+        mock_client(route)
+        poster = YouTubePoster()
+        poster.authenticated = True
+        
+        video_id = await poster._upload_video('Title', 'Description', 'https://cdn.example.com/video.mp4')
+        
+        assert video_id == 'video'
+        assert b''.join(body for _, body in handler.sent) == b'012345'
+
+class TestTikTokUpload:
+    """Test TikTok chunked video upload"""
+    
+    @pytest.mark.parametrize('video_size, plan', [
+        (1000, (1000, 1)),
+        (tiktok_api.CHUNK_SIZE, (tiktok_api.CHUNK_SIZE, 1)),
+        (tiktok_api.CHUNK_SIZE * 2, (tiktok_api.CHUNK_SIZE, 2)),
+        (tiktok_api.CHUNK_SIZE * 3 - 1, (tiktok_api.CHUNK_SIZE, 2))
+    ])
+    async def test_chunk_plan(self, video_size, plan):
+        """Test the remainder is folded into the last chunk"""
+        assert _chunk_plan(video_size) == plan
+    
+    async def test_last_chunk_carries_remainder(self, mock_client, monkeypatch):
+        """Test the video is PUT in planned chunks with the remainder in the last one"""
+        monkeypatch.setattr(tiktok_api, 'CHUNK_SIZE', 4)
+        sent = []
+        
+        def handler(request):
+            sent.append(request)
+            if request.url.host == 'cdn.example.com':
+                return httpx.Response(200, content=b'0123456789')
+            if request.method == 'POST':
+                return httpx.Response(200, json={'data': {
+                    'upload_url': 'https://upload.example.com/video',
+                    'publish_id': 'publish'
+                }})
+            return httpx.Response(201)
+        
+        mock_client(handler)
+        
+        publish_id = await TikTokPoster()._upload_video('https://cdn.example.com/video.mp4')
+        
+        assert publish_id == 'publish'
+        download, init, *puts = sent
+        assert download.headers['Accept-Encoding'] == 'identity'
+        assert orjson.loads(init.content)['source_info'] == {
+            'source': 'FILE_UPLOAD',
+            'video_size': 10,
+            'chunk_size': 4,
+            'total_chunk_count': 2
+        }
+        assert [(put.headers['Content-Range'], put.content) for put in puts] == [
+            ('bytes 0-3/10', b'0123'),
+            ('bytes 4-9/10', b'456789')
+        ]